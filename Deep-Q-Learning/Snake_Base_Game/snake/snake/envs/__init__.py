@@ -1 +1,32 @@
-from snake.envs.snake_env import SnakeEnv
\ No newline at end of file
+from snake.envs.engine import SnakeEngine
+from snake.envs.snake_env import SnakeEnv
+
+# Everything else is imported on first use, so that making an env never pays for
+# multiprocessing, shared memory or pygame unless it needs them
+LAZY_IMPORTS = {
+    'VecSnakeEnv': 'snake.envs.vec_env',
+    'SubprocVecEnv': 'snake.envs.subproc_vec_env',
+    'FrameStack': 'snake.envs.frame_stack',
+    'LazyFrames': 'snake.envs.frame_stack',
+    'Viewer': 'snake.envs.viewer',
+    'EpisodeRecorder': 'snake.envs.recorder',
+    'EpisodeLog': 'snake.envs.recorder',
+    'SessionHost': 'snake.envs.server',
+    'SnakeClient': 'snake.envs.client',
+    'WallLayout': 'snake.envs.layouts',
+    'load_layout': 'snake.envs.layouts',
+    'generate_layout': 'snake.envs.layouts',
+}
+
+
+def __getattr__(name):
+    if name in LAZY_IMPORTS:
+        module = __import__(LAZY_IMPORTS[name], fromlist=[name])
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(LAZY_IMPORTS))
@@ -0,0 +1,172 @@
+'''
+asyncio client for snake.envs.server, plus a stand-in that drives many sessions with random
+actions and reports how fast the server answers:
+
+    python -m snake.envs.server --port 8765 &
+    python -m snake.envs.client --port 8765 --sessions 1000 --steps 100
+
+Against a server started with --tick-rate, --ticks N instead follows N tick updates and answers
+each with an act per session.
+'''
+import argparse, asyncio, itertools, json, random, time
+
+from snake.envs.server import LINE_LIMIT
+
+
+class SnakeClient():
+    '''
+    One connection to a SessionHost. Requests can be awaited concurrently, replies are
+    matched to them by id, and tick updates are queued in ticks. Errors the server sends back
+    for acts, which have no id, are kept in errors and raised by the next act().
+    '''
+
+    def __init__(self):
+        self.ids = itertools.count()
+        self.pending = {}
+        self.ticks = asyncio.Queue()
+        self.errors = []
+
+    async def connect(self, host='127.0.0.1', port=8765):
+        self.reader, self.writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        self.listener = asyncio.ensure_future(self.listen())
+        return self
+
+    async def listen(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if "tick" in message:
+                    self.ticks.put_nowait(message)
+                elif "id" in message:
+                    self.pending.pop(message["id"]).set_result(message)
+                else:
+                    # Only requests without an id are answered like this, and only when they fail
+                    self.errors.append(message.get("error", 'Unexpected message %r' % (message,)))
+        finally:
+            # Nothing else will answer the requests still waiting
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('Connection to the server was lost'))
+            self.pending.clear()
+
+    def send(self, request):
+        self.writer.write(json.dumps(request).encode() + b'\n')
+
+    async def request(self, cmd, **fields):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.send(dict(fields, cmd=cmd, id=request_id))
+        reply = await future
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    async def open(self, variant='snake', seed=None, layout=None):
+        return await self.request("open", variant=variant, seed=seed, layout=layout)
+
+    async def reset(self, session):
+        return await self.request("reset", session=session)
+
+    async def step(self, session, action):
+        return await self.request("step", session=session, action=action)
+
+    async def step_many(self, actions):
+        '''
+        Steps every session in actions, a {session: action} dict, with one request
+        '''
+        reply = await self.request("step_many", actions={str(session): action for session, action in actions.items()})
+        return {int(session): result for session, result in reply["results"].items()}
+
+    def act(self, session, action):
+        '''
+        Sets the action for the next tick, nothing is sent back. Raises the errors of earlier acts
+        '''
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise RuntimeError('; '.join(errors))
+        self.send({"cmd": "act", "session": session, "action": action})
+
+    async def close_session(self, session):
+        return await self.request("close", session=session)
+
+    async def stats(self):
+        return await self.request("stats")
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.listener.cancel()
+
+
+async def follow_ticks(client, session_ids, ticks, rng):
+    '''
+    Answers ticks tick updates with a random act per session, returns the seconds it took
+    '''
+    await client.ticks.get()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for session in session_ids:
+            client.act(session, rng.randrange(4))
+        message = await client.ticks.get()
+        missing = set(session_ids) - set(map(int, message["updates"]))
+        if missing:
+            raise RuntimeError('Tick %d has no update for sessions %s' % (message["tick"], sorted(missing)))
+    return time.perf_counter() - start
+
+
+async def stand_in(host, port, sessions, steps, variant, seed, ticks=0):
+    '''
+    Opens sessions games and plays steps random steps in each, batched with step_many,
+    or follows ticks tick updates if ticks is set
+    '''
+    client = await SnakeClient().connect(host, port)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    opened = await asyncio.gather(*[client.open(variant, seed=seed + i) for i in range(sessions)])
+    session_ids = [reply["session"] for reply in opened]
+    open_time = time.perf_counter() - start
+
+    if ticks:
+        elapsed = await follow_ticks(client, session_ids, ticks, rng)
+        stats = await client.stats()
+        await client.close()
+        print('opened %d sessions in %.1f ms, followed %d ticks at %.1f ticks/s, server stats %s' % (
+            sessions, open_time * 1e3, ticks, ticks / elapsed, stats))
+        return
+
+    start = time.perf_counter()
+    scores = dict.fromkeys(session_ids, 0)
+    for _ in range(steps):
+        results = await client.step_many({session: rng.randrange(4) for session in session_ids})
+        finished = [session for session, result in results.items() if result["done"]]
+        for session, result in results.items():
+            scores[session] = max(scores[session], result["state"]["score"])
+        await asyncio.gather(*[client.reset(session) for session in finished])
+    step_time = time.perf_counter() - start
+
+    stats = await client.stats()
+    await asyncio.gather(*[client.close_session(session) for session in session_ids])
+    await client.close()
+    print('opened %d sessions in %.1f ms, %.0f session steps/s over the socket, best score %d, server stats %s' % (
+        sessions, open_time * 1e3, sessions * steps / step_time, max(scores.values()), stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--variant', default='snake')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ticks', type=int, default=0, help='follow this many tick updates instead of stepping')
+    args = parser.parse_args()
+    asyncio.run(stand_in(args.host, args.port, args.sessions, args.steps, args.variant, args.seed, args.ticks))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,875 @@
+import copy, os, time
+from array import array
+from collections import deque, namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+import gym
+from gym import spaces
+
+import random
+
+from snake.envs.layouts import WallLayout, compile_layout, generate_layout, load_layout
+
+# Plain RGB tuples so they can be written into NumPy frames as well as drawn by pygame
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+BROWN = (139, 69, 19)
+
+# Flags stored in SnakeEngine.item_grid
+FOOD = 1
+POISON = 2
+
+# Channels of the obs_mode='grid' observation
+GRID_CHANNELS = ('head', 'body', 'food', 'poison', 'wall')
+# Size of the obs_mode='gray' observation, the IMG_SHAPE the DQN notebooks resize to
+GRAY_SHAPE = (84, 84)
+# Headings in the order of the actions that pick them, and the rays of the obs_mode='rays' observation
+DIRECTIONS = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+# The heading to the left and to the right of every heading
+LEFT_OF = {'UP': 'LEFT', 'LEFT': 'DOWN', 'DOWN': 'RIGHT', 'RIGHT': 'UP'}
+RIGHT_OF = {'UP': 'RIGHT', 'RIGHT': 'DOWN', 'DOWN': 'LEFT', 'LEFT': 'UP'}
+# What a ray looks for, in the order of the obs_mode='rays' observation
+RAY_KINDS = ('wall', 'body', 'food', 'poison')
+# Entries of the obs_mode='rays' observation
+RAY_FEATURES = (
+    ('danger_straight', 'danger_left', 'danger_right')
+    + tuple('%s_%s' % (ray.lower(), kind) for ray in DIRECTIONS for kind in RAY_KINDS)
+    + tuple('heading_%s' % heading.lower() for heading in DIRECTIONS))
+# PIL's fixed point ITU-R 601-2 luma weights for convert("L"), scaled down to exact floats
+LUMA = np.array([19595, 38470, 7471]) / (1 << 16)
+
+# The phases of step() that profile=True times, in the order they run, plus reset()
+PHASES = ('change_direction', 'move', 'body_insert', 'item_handler', 'update_game_state',
+          'game_over', 'observation', 'sleep', 'reset')
+
+# Where the snake starts, head first, heading right
+START_BODY = ((100, 50), (90, 50), (80, 50))
+# Cells generated layouts keep empty: the start and the two cells ahead of the head
+START_CLEAR = START_BODY + ((110, 50), (120, 50))
+
+# Everything clone_state() captures, see SnakeEngine.clone_state()
+EngineState = namedtuple('EngineState', [
+    'snake_pos', 'snake_body', 'direction', 'food_items', 'poison_items', 'score', 'steps',
+    'rng_state', 'body_grid', 'item_grid', 'free_cells', 'free_slot'])
+
+
+def bicubic(x):
+    # Keys cubic kernel with a = -0.5, the one PIL uses for Image.BICUBIC
+    a = -0.5
+    x = abs(x)
+    if x < 1.0:
+        return ((a + 2.0) * x - (a + 3.0)) * x * x + 1
+    if x < 2.0:
+        return (((x - 5) * x + 8) * x - 4) * a
+    return 0.0
+
+
+@lru_cache(maxsize=None)
+def resize_weights(in_size, out_size, block=10):
+    '''
+    PIL's fixed point bicubic weights for shrinking in_size pixels to out_size,
+    summed over every block of pixels so they apply straight to a row of cells.
+    Returns a read-only (out_size, in_size // block) float64 matrix. The weights are
+    PIL's 22 bit integers divided by 2**22, which keeps every product and sum exact.
+    '''
+    scale = in_size / out_size
+    filterscale = max(scale, 1.0)
+    support = 2.0 * filterscale
+    weights = np.zeros((out_size, in_size // block))
+    for xx in range(out_size):
+        center = (xx + 0.5) * scale
+        xmin = max(int(center - support + 0.5), 0)
+        xmax = min(int(center + support + 0.5), in_size)
+        kernel = [bicubic((x - center + 0.5) / filterscale) for x in range(xmin, xmax)]
+        total = sum(kernel)
+        for x, k in zip(range(xmin, xmax), kernel):
+            # PIL rounds the normalized weights to 22 fractional bits
+            k = k / total * (1 << 22)
+            weights[xx, x // block] += int(k - 0.5) if k < 0 else int(k + 0.5)
+    weights /= 1 << 22
+    weights.flags.writeable = False
+    return weights
+
+
+@lru_cache(maxsize=None)
+def observation_template(obs_mode, frame_size_y, frame_size_x):
+    '''
+    Returns the observation space of obs_mode that make_spaces() copies, with read-only bounds
+    '''
+    if obs_mode == 'grid':
+        space = spaces.Box(0, 1, shape=(len(GRID_CHANNELS), frame_size_y // 10, frame_size_x // 10), dtype=np.int8)
+    elif obs_mode == 'gray':
+        space = spaces.Box(0, 255, shape=GRAY_SHAPE, dtype=np.uint8)
+    elif obs_mode == 'rays':
+        space = spaces.Box(0, 1, shape=(len(RAY_FEATURES),), dtype=np.float32)
+    else:
+        space = spaces.Box(0, 255, shape=(frame_size_y, frame_size_x, 3), dtype=np.uint8)
+    for bounds in (space.low, space.high, space.bounded_below, space.bounded_above):
+        bounds.flags.writeable = False
+    return space
+
+
+def make_spaces(obs_mode, frame_size_y, frame_size_x):
+    '''
+    Returns a new (action_space, observation_space) of obs_mode. Every env needs its own, as
+    spaces keep the random generator that space.seed() sets and sample() draws from. Only the
+    bounds of the observation space are shared
+    '''
+    observation_space = copy.copy(observation_template(obs_mode, frame_size_y, frame_size_x))
+    # Unseeded, like a new space, gym creates the generator when it is first used
+    observation_space._np_random = None
+    return spaces.Discrete(4), observation_space
+
+
+@lru_cache(maxsize=None)
+def wall_frame(walls, frame_size_y, frame_size_x):
+    '''
+    Returns the read-only RGB frame of walls on an empty board, shared by every env with these walls
+    '''
+    frame = np.zeros((frame_size_y, frame_size_x, 3), dtype=np.uint8)
+    for x, y in walls:
+        frame[y:y + 10, x:x + 10] = BROWN
+    frame.flags.writeable = False
+    return frame
+
+
+class SnakeEngine(gym.Env):
+    '''
+    The game behind every snake env variant: movement, food and poison items, static walls,
+    rewards and rendering.
+
+    A variant is a subclass that sets the class attributes below and, if it has walls,
+    overrides spawn_wall(). Eating any item respawns all of them.
+    '''
+    metadata = {'render.modes': ['human']}
+
+    # Number of food and poison items on the board
+    FOOD_COUNT = 1
+    POISON_COUNT = 0
+    # Rewards for eating food or poison, and for running into the border, the snake or a wall
+    FOOD_REWARD = 1
+    POISON_REWARD = -1
+    DEATH_REWARD = -1
+    # Directory of the map files a layout name refers to, see make_layout()
+    MAP_DIR = None
+
+    def __init__(self, obs_mode='rgb', profile=False, viewer_fps=None, frame_skip=1, max_pool=False, layout=None,
+                 observe=True):
+        '''
+        obs_mode picks what step() and reset() return:
+        'rgb' is the (200, 200, 3) uint8 game frame,
+        'grid' is a (5, 20, 20) int8 tensor with one 0/1 channel per GRID_CHANNELS entry,
+        'gray' is the (84, 84) uint8 frame the DQN notebooks' ImageProcessor makes from 'rgb',
+        'rays' is a (23,) float32 feature vector for small MLPs, see get_rays_from_game()
+
+        profile=True times every phase of step() and reset(), see stats(). It can also be
+        switched on or off later through the profile attribute.
+
+        viewer_fps opens a Viewer window showing the game at up to that many frames per
+        second, see open_viewer()
+
+        frame_skip repeats every action for that many game ticks in one step(), summing the
+        rewards and stopping early when the game ends. Only the last tick's observation is
+        built. max_pool=True returns the elementwise maximum of the last two ticks' observations
+        instead, when the step ran for all its ticks
+
+        layout replaces the variant's walls, see make_layout()
+
+        observe=False makes step() and reset() return None instead of an observation and
+        stops keeping the frame painted, for runs that only read rewards and scores. The
+        game plays exactly the same. render() and get_observation() still work, they
+        repaint what they need. Can also be switched later through the observe attribute.
+        '''
+        if obs_mode not in ('rgb', 'grid', 'gray', 'rays'):
+            raise ValueError("obs_mode must be 'rgb', 'grid', 'gray' or 'rays', got %r" % (obs_mode,))
+        if not isinstance(frame_skip, int) or frame_skip < 1:
+            raise ValueError('frame_skip must be a positive int, got %r' % (frame_skip,))
+        self.obs_mode = obs_mode
+        self.frame_size_x = 200
+        self.frame_size_y = 200
+        self.action_space, self.observation_space = make_spaces(obs_mode, self.frame_size_y, self.frame_size_x)
+        # RGB observations are painted straight into this buffer, no pygame surface is involved.
+        # It is only allocated by the first redraw_game_state(), grid and gray envs may never need it
+        self.frame = None
+        # Number of snake segments on every 10x10 cell, indexed [y // 10, x // 10]
+        self.body_grid = np.zeros((self.frame_size_y // 10, self.frame_size_x // 10), dtype=np.uint8)
+        # The FOOD and POISON flags of every cell, indexed like body_grid
+        self.item_grid = np.zeros((self.frame_size_y // 10, self.frame_size_x // 10), dtype=np.uint8)
+        # Walls never change, they are compiled once and shared with every env of the same layout
+        self.layout = self.make_layout(layout)
+        self.wall_pos = self.layout.walls
+        self.wall_grid = self.layout.mask
+        # free_cells holds every spawn region cell without a segment, wall or item as a flat index
+        # y // 10 * 20 + x // 10, and free_slot maps each cell to its index in free_cells or -1.
+        # Both are int16 arrays, a few hundred Python ints would cost kilobytes per env
+        self.free_cells = array('h')
+        self.free_slot = array('h')
+        # Set by restore_state() and by steps with observe off, the next observation or render() repaints it
+        self.frame_stale = True
+        # The pygame window is only opened by the first render(mode='human')
+        self.game_window = None
+        # STEP_LIMIT counts game ticks, so frame skipping does not make episodes longer
+        self.STEP_LIMIT = 1000
+        self.sleep = 0
+        self.frame_skip = frame_skip
+        self.max_pool = max_pool
+        self.observe = observe
+        self.profile = profile
+        self.reset_stats()
+        self.viewer = None
+        self.seed()
+        self.reset()
+        if viewer_fps:
+            self.open_viewer(viewer_fps)
+
+    def make_layout(self, layout=None):
+        '''
+        Returns the WallLayout of layout, which is one of
+        None: the walls of spawn_wall(),
+        a list of wall positions like spawn_wall() returns,
+        a map file path, or the name of a map in MAP_DIR without its .txt,
+        an int: the seed of a generated layout, see snake.envs.layouts.generate_layout(),
+        a WallLayout
+        '''
+        shape = (self.frame_size_y // 10, self.frame_size_x // 10)
+        if layout is None:
+            layout = compile_layout(self.spawn_wall(), shape)
+        elif isinstance(layout, WallLayout):
+            if layout.mask.shape != shape:
+                raise ValueError('Layout is %dx%d cells, the board is %dx%d' % (layout.mask.shape[::-1] + shape[::-1]))
+        elif isinstance(layout, int) and not isinstance(layout, bool):
+            layout = generate_layout(layout, shape, keep_clear=START_CLEAR)
+        elif isinstance(layout, (str, os.PathLike)):
+            path = layout
+            if self.MAP_DIR is not None and not os.path.exists(path):
+                path = os.path.join(self.MAP_DIR, '%s.txt' % (layout,))
+            layout = load_layout(path, shape)
+        else:
+            layout = compile_layout(layout, shape)
+        if any(layout.mask[y // 10, x // 10] for x, y in START_BODY):
+            raise ValueError('The layout has walls where the snake starts, %s' % (START_BODY,))
+        return layout
+
+    def open_viewer(self, fps=30):
+        '''
+        Shows the game in a window drawn by another process, at up to fps frames per second.
+        step() keeps running at full speed, it only hands over the cell colors when the
+        viewer is due for a new frame. Replaces sleep as a way to watch an agent.
+        '''
+        from snake.envs.viewer import Viewer
+
+        self.close_viewer()
+        self.viewer = Viewer(self.body_grid.shape + (3,), fps=fps, title=type(self).__module__.split('.')[0])
+        self.publish_frame()
+
+    def close_viewer(self):
+        if self.viewer is not None:
+            self.viewer.close()
+            self.viewer = None
+
+    def publish_frame(self):
+        self.viewer.publish(self.get_cell_colors(), self.score)
+
+    def reset_stats(self):
+        # Call count and total seconds of every phase in PHASES
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.phase_time = dict.fromkeys(PHASES, 0.0)
+
+    def stats(self):
+        '''
+        Returns {phase: {"calls", "total_s", "mean_us", "share"}} for every phase in PHASES,
+        share is the phase's fraction of all profiled time
+        '''
+        total = sum(self.phase_time.values())
+        stats = {}
+        for phase in PHASES:
+            calls = self.phase_calls[phase]
+            seconds = self.phase_time[phase]
+            stats[phase] = {
+                "calls": calls,
+                "total_s": seconds,
+                "mean_us": seconds / calls * 1e6 if calls else 0.0,
+                "share": seconds / total if total else 0.0,
+            }
+        return stats
+
+    def format_stats(self):
+        lines = ['%-18s %10s %12s %10s %7s' % ('phase', 'calls', 'total ms', 'mean us', 'share')]
+        for phase, stat in self.stats().items():
+            lines.append('%-18s %10d %12.2f %10.2f %6.1f%%' % (
+                phase, stat["calls"], stat["total_s"] * 1e3, stat["mean_us"], stat["share"] * 100))
+        return '\n'.join(lines)
+
+    def seed(self, seed=None):
+        '''
+        Gives the env its own random stream, so item spawns only depend on seed and the actions
+        '''
+        self.rng = random.Random(seed)
+        # getstate() of the Mersenne Twister is slow, clone_state() reuses it until the next draw
+        self.rng_state = None
+        return [seed]
+
+    def get_rng_state(self):
+        if self.rng_state is None:
+            self.rng_state = self.rng.getstate()
+        return self.rng_state
+
+    def clone_state(self):
+        '''
+        Returns the game state as a picklable EngineState made of tuples, ints and bytes.
+        Walls and the frame are not part of it: walls never change within an env and
+        the frame is repainted from the state when it is needed.
+        '''
+        return EngineState(
+            tuple(self.snake_pos), tuple(map(tuple, self.snake_body)), self.direction,
+            tuple(map(tuple, self.food_items)), tuple(map(tuple, self.poison_items)),
+            self.score, self.steps, self.get_rng_state(),
+            self.body_grid.tobytes(), self.item_grid.tobytes(),
+            self.free_cells.tobytes(), self.free_slot.tobytes())
+
+    def restore_state(self, state):
+        '''
+        Puts the env back into a state returned by clone_state(), of this env or another
+        env of the same variant. Nothing is painted until an observation is requested.
+        '''
+        self.snake_pos = list(state.snake_pos)
+        self.snake_body = deque(map(list, state.snake_body))
+        self.direction = state.direction
+        self.food_items = list(map(list, state.food_items))
+        self.poison_items = list(map(list, state.poison_items))
+        self.score = state.score
+        self.steps = state.steps
+        if state.rng_state is not self.rng_state:
+            self.rng.setstate(state.rng_state)
+            self.rng_state = state.rng_state
+        self.body_grid[:] = np.frombuffer(state.body_grid, dtype=self.body_grid.dtype).reshape(self.body_grid.shape)
+        self.item_grid[:] = np.frombuffer(state.item_grid, dtype=self.item_grid.dtype).reshape(self.item_grid.shape)
+        self.free_cells = array('h', state.free_cells)
+        self.free_slot = array('h', state.free_slot)
+        self.frame_stale = True
+
+    def step(self, action):
+        if self.profile:
+            return self.profiled_step(action)
+        if not self.observe:
+            # Nothing reads the frame, it is repainted once something does
+            self.frame_stale = True
+        total_reward = 0
+        pooled = None
+        for tick in range(self.frame_skip):
+            # The tick before the last is the only skipped one that gets an observation
+            if self.max_pool and tick and tick == self.frame_skip - 1 and self.observe:
+                pooled = self.get_observation()
+            reward, done = self.tick(action)
+            total_reward += reward
+            if done:
+                break
+
+        img = self.get_observation() if self.observe else None
+        if pooled is not None and not done:
+            np.maximum(img, pooled, out=img)
+        info = {"score": self.score}
+        if self.viewer is not None and self.viewer.due():
+            self.publish_frame()
+        if self.sleep:
+            time.sleep(self.sleep)
+        return img, total_reward, done, info
+
+    def tick(self, action):
+        '''
+        Advances the game by one tick and returns (reward, done). The RGB frame is kept in
+        sync, but no observation is built
+        '''
+        self.direction = self.change_direction(action, self.direction)
+        self.snake_pos = self.move(self.direction, self.snake_pos)
+        self.snake_body.appendleft(list(self.snake_pos))
+        self.add_segment(self.snake_pos)
+
+        reward = self.item_handler()
+
+        # Grid and gray observations are built from the game state, the frame is only needed for render()
+        if self.obs_mode == 'rgb' and not self.frame_stale:
+            self.update_game_state()
+
+        reward, done = self.game_over(reward)
+        self.steps += 1
+        return reward, done
+
+    def profiled_step(self, action):
+        '''
+        step() with a timer around every phase. The phase times of this step, summed over its
+        ticks, are also returned in info["profile"]
+        '''
+        clock = time.perf_counter
+        times = dict.fromkeys(('change_direction', 'move', 'body_insert', 'item_handler', 'game_over'), 0.0)
+        if not self.observe:
+            self.frame_stale = True
+        total_reward = 0
+        pooled = None
+        observed = 0.0
+        for tick in range(self.frame_skip):
+            if self.max_pool and tick and tick == self.frame_skip - 1 and self.observe:
+                t0 = clock()
+                pooled = self.get_observation()
+                observed += clock() - t0
+            reward, done = self.profiled_tick(action, times)
+            total_reward += reward
+            if done:
+                break
+
+        t6 = clock()
+        img = self.get_observation() if self.observe else None
+        if pooled is not None and not done:
+            np.maximum(img, pooled, out=img)
+        t7 = clock()
+        times['observation'] = observed + t7 - t6
+        if self.viewer is not None and self.viewer.due():
+            self.publish_frame()
+        if self.sleep:
+            time.sleep(self.sleep)
+            times['sleep'] = clock() - t7
+
+        for phase, seconds in times.items():
+            self.phase_calls[phase] += 1
+            self.phase_time[phase] += seconds
+        info = {"score": self.score, "profile": times}
+        return img, total_reward, done, info
+
+    def profiled_tick(self, action, times):
+        '''
+        tick() adding the seconds of every phase to times
+        '''
+        clock = time.perf_counter
+        t0 = clock()
+        self.direction = self.change_direction(action, self.direction)
+        t1 = clock()
+        self.snake_pos = self.move(self.direction, self.snake_pos)
+        t2 = clock()
+        self.snake_body.appendleft(list(self.snake_pos))
+        self.add_segment(self.snake_pos)
+        t3 = clock()
+
+        reward = self.item_handler()
+        t4 = clock()
+
+        if self.obs_mode == 'rgb' and not self.frame_stale:
+            self.update_game_state()
+            times['update_game_state'] = times.get('update_game_state', 0.0) + clock() - t4
+        t5 = clock()
+
+        reward, done = self.game_over(reward)
+        t6 = clock()
+        self.steps += 1
+
+        times['change_direction'] += t1 - t0
+        times['move'] += t2 - t1
+        times['body_insert'] += t3 - t2
+        times['item_handler'] += t4 - t3
+        times['game_over'] += t6 - t5
+        return reward, done
+
+    @staticmethod
+    def change_direction(action, direction):
+        if action == 0 and direction != "DOWN":
+            direction = 'UP'
+        if action==1 and direction != "UP":
+            direction = 'DOWN'
+        if action==2 and direction != "RIGHT":
+            direction = 'LEFT'
+        if action==3 and direction != "LEFT":
+            direction = 'RIGHT'
+        return direction
+
+    @staticmethod
+    def move(direction, snake_pos):
+        if direction == 'UP':
+            snake_pos[1] -= 10
+        if direction == 'DOWN':
+            snake_pos[1] += 10
+        if direction == 'LEFT':
+            snake_pos[0] -= 10
+        if direction == 'RIGHT':
+            snake_pos[0] += 10
+        return snake_pos
+
+    def in_window(self, pos):
+        return 0 <= pos[0] < self.frame_size_x and 0 <= pos[1] < self.frame_size_y
+
+    def add_segment(self, pos):
+        if self.in_window(pos):
+            self.body_grid[pos[1] // 10, pos[0] // 10] += 1
+            self.occupy(pos)
+
+    def remove_segment(self, pos):
+        if self.in_window(pos):
+            self.body_grid[pos[1] // 10, pos[0] // 10] -= 1
+            self.release(pos)
+
+    def cell_index(self, pos):
+        return pos[1] // 10 * (self.frame_size_x // 10) + pos[0] // 10
+
+    def occupy(self, pos):
+        '''
+        Takes pos out of free_cells by moving the last free cell into its slot
+        '''
+        cell = self.cell_index(pos)
+        slot = self.free_slot[cell]
+        if slot < 0:
+            return
+        last = self.free_cells.pop()
+        if last != cell:
+            self.free_cells[slot] = last
+            self.free_slot[last] = slot
+        self.free_slot[cell] = -1
+
+    def release(self, pos):
+        '''
+        Puts pos back into free_cells once nothing covers it
+        '''
+        cell = self.cell_index(pos)
+        y, x = pos[1] // 10, pos[0] // 10
+        if self.free_slot[cell] >= 0 or not self.layout.open_mask[y, x]:
+            return
+        if self.body_grid[y, x] or self.item_grid[y, x]:
+            return
+        self.free_slot[cell] = len(self.free_cells)
+        self.free_cells.append(cell)
+
+    def index_free_cells(self):
+        '''
+        Rebuilds free_cells and free_slot from the grids
+        '''
+        cells = self.layout.open_cells
+        cells = cells[(self.body_grid.ravel()[cells] == 0) & (self.item_grid.ravel()[cells] == 0)]
+        slots = np.full(self.body_grid.size, -1, dtype=np.int16)
+        slots[cells] = np.arange(len(cells))
+        self.free_cells = array('h', cells.tobytes())
+        self.free_slot = array('h', slots.tobytes())
+
+    def on_body(self, pos):
+        '''
+        Returns Boolean indicating if any snake segment covers pos
+        '''
+        return self.in_window(pos) and self.body_grid[pos[1] // 10, pos[0] // 10] > 0
+
+    def item_at_head(self):
+        if not self.in_window(self.snake_pos):
+            return 0
+        return self.item_grid[self.snake_pos[1] // 10, self.snake_pos[0] // 10]
+
+    def eat(self):
+        '''
+        Returns Boolean indicating if Snake has "eaten" a white food square
+        '''
+        return bool(self.item_at_head() & FOOD)
+
+    def poisoned(self):
+        '''
+        Returns Boolean indicating if Snake has "eaten" a red poison square
+        '''
+        return bool(self.item_at_head() & POISON)
+
+    def spawn_wall(self):
+        '''
+        Returns the wall positions of this variant, none by default. Called once per env,
+        the walls are compiled into self.layout
+        '''
+        return []
+
+    def spawn_item(self, flag):
+        '''
+        Places one item on a cell drawn uniformly from free_cells, returns None if the board is full
+        '''
+        if not self.free_cells:
+            return None
+        cell = self.free_cells[self.rng.randrange(len(self.free_cells))]
+        self.rng_state = None
+        pos = [cell % (self.frame_size_x // 10) * 10, cell // (self.frame_size_x // 10) * 10]
+        self.occupy(pos)
+        self.item_grid[pos[1] // 10, pos[0] // 10] = flag
+        return pos
+
+    def spawn_items(self):
+        '''
+        Replaces every food and poison with new ones, the old positions are kept in stale_items
+        '''
+        self.stale_items = self.food_items + self.poison_items
+        for pos in self.stale_items:
+            self.item_grid[pos[1] // 10, pos[0] // 10] = 0
+            self.release(pos)
+        food_items = (self.spawn_item(FOOD) for _ in range(self.FOOD_COUNT))
+        self.food_items = [pos for pos in food_items if pos is not None]
+        poison_items = (self.spawn_item(POISON) for _ in range(self.POISON_COUNT))
+        self.poison_items = [pos for pos in poison_items if pos is not None]
+
+    def item_handler(self):
+        self.vacated_pos = None
+        self.stale_items = []
+        if self.eat():
+            self.score += 1
+            reward = self.FOOD_REWARD
+        elif self.poisoned():
+            if self.score > 0:
+                self.score -= 1
+            reward = self.POISON_REWARD
+        else:
+            self.vacated_pos = self.snake_body.pop()
+            self.remove_segment(self.vacated_pos)
+            return 0
+
+        self.spawn_items()
+        return reward
+
+    def paint_cell(self, pos, color):
+        '''
+        Paints one 10x10 block of the frame, blocks outside of the window are skipped
+        '''
+        if self.in_window(pos):
+            self.frame[pos[1]:pos[1] + 10, pos[0]:pos[0] + 10] = color
+
+    def paint_items(self):
+        # Draw Food
+        for pos in self.food_items:
+            self.paint_cell(pos, WHITE)
+
+        # Draw Poison
+        for pos in self.poison_items:
+            self.paint_cell(pos, RED)
+
+    def redraw_game_state(self):
+        '''
+        Repaints the whole frame from scratch
+        '''
+        self.frame_stale = False
+        if self.frame is None:
+            self.frame = np.zeros((self.frame_size_y, self.frame_size_x, 3), dtype=np.uint8)
+            self.walls_frame = wall_frame(self.wall_pos, self.frame_size_y, self.frame_size_x)
+        # Draw Wall, by starting from the layout's empty board
+        np.copyto(self.frame, self.walls_frame)
+
+        # Draw Snake
+        for pos in self.snake_body:
+            self.paint_cell(pos, GREEN)
+
+        self.paint_items()
+
+    def update_game_state(self):
+        '''
+        Repaints only the cells a step can change: the vacated tail, the old item cells
+        after a respawn, the new head and the items. Walls never change.
+        '''
+        if self.vacated_pos is not None:
+            self.paint_cell(self.vacated_pos, BLACK)
+        # Items may have spawned on the body, only happens when something was eaten
+        for pos in self.stale_items:
+            self.paint_cell(pos, GREEN if self.on_body(pos) else BLACK)
+        self.paint_cell(self.snake_pos, GREEN)
+
+        self.paint_items()
+
+    def get_image_array_from_game(self):
+        if self.frame_stale:
+            self.redraw_game_state()
+        return self.frame.copy()
+
+    def get_grid_from_game(self):
+        '''
+        Returns the game as a (5, 20, 20) int8 tensor, see GRID_CHANNELS for the channel order
+        '''
+        grid = np.zeros((len(GRID_CHANNELS),) + self.body_grid.shape, dtype=np.int8)
+        grid[1] = self.body_grid > 0
+        if self.in_window(self.snake_pos):
+            head = (self.snake_pos[1] // 10, self.snake_pos[0] // 10)
+            grid[0][head] = 1
+            # Only a collision leaves another segment under the head
+            grid[1][head] = self.body_grid[head] > 1
+        for pos in self.food_items:
+            grid[2, pos[1] // 10, pos[0] // 10] = 1
+        for pos in self.poison_items:
+            grid[3, pos[1] // 10, pos[0] // 10] = 1
+        grid[4] = self.wall_grid
+        return grid
+
+    def get_cell_colors(self):
+        '''
+        Returns the (20, 20, 3) color of every cell, layered the way redraw_game_state() paints them
+        '''
+        cells = np.zeros(self.body_grid.shape + (3,))
+        cells[self.wall_grid] = BROWN
+        cells[self.body_grid > 0] = GREEN
+        for pos in self.food_items:
+            cells[pos[1] // 10, pos[0] // 10] = WHITE
+        for pos in self.poison_items:
+            cells[pos[1] // 10, pos[0] // 10] = RED
+        return cells
+
+    def get_gray_from_game(self):
+        '''
+        Returns the same (84, 84) uint8 image as PIL's bicubic resize of the RGB frame followed
+        by convert("L"), but computed from the 20x20 cell colors instead of 40000 pixels
+        '''
+        weights_y = resize_weights(self.frame_size_y, GRAY_SHAPE[0])
+        weights_x = resize_weights(self.frame_size_x, GRAY_SHAPE[1])
+        cells = self.get_cell_colors().transpose(2, 0, 1)
+        # PIL resizes horizontally first, then vertically, rounding and clipping to 8 bits after each pass
+        img = cells @ weights_x.T
+        img += 0.5
+        np.clip(np.floor(img, out=img), 0, 255, out=img)
+        img = weights_y @ img
+        img += 0.5
+        np.clip(np.floor(img, out=img), 0, 255, out=img)
+        gray = LUMA @ img.reshape(3, -1)
+        gray += 0.5
+        return np.floor(gray, out=gray).astype(np.uint8).reshape(GRAY_SHAPE)
+
+    @staticmethod
+    def first_hit(cells, start, step):
+        '''
+        Returns the number of steps of step from index start to the first nonzero entry of cells, 0 if none
+        '''
+        i = start + step
+        while 0 <= i < len(cells):
+            if cells[i]:
+                return (i - start) // step
+            i += step
+        return 0
+
+    def get_rays_from_game(self):
+        '''
+        Returns the (23,) float32 vector named by RAY_FEATURES, built from the grids in
+        O(rays x board width):
+        whether going straight, left or right runs into the border, a wall or the body,
+        then for the rays up, down, left and right from the head 1 / the distance in cells
+        to the first wall or border, body segment, food and poison, 0 if the ray meets none,
+        then the heading one-hot
+        '''
+        features = [0.0] * len(RAY_FEATURES)
+        heading = len(features) - len(DIRECTIONS)
+        features[heading + DIRECTIONS.index(self.direction)] = 1.0
+        if not self.in_window(self.snake_pos):
+            return np.array(features, dtype=np.float32)
+
+        head_x, head_y = self.snake_pos
+        y, x = head_y // 10, head_x // 10
+        # Cells to the first thing of every RAY_KINDS kind along the rays in DIRECTIONS order, 0 for none
+        column = self.body_grid[:, x].tolist()
+        row = self.body_grid[y].tolist()
+        body = (self.first_hit(column, y, -1), self.first_hit(column, y, 1),
+                self.first_hit(row, x, -1), self.first_hit(row, x, 1))
+        distance = [[wall, cells, 0, 0] for wall, cells in zip(self.layout.wall_distance[:, y, x].tolist(), body)]
+        for kind, items in ((2, self.food_items), (3, self.poison_items)):
+            for item_x, item_y in items:
+                if item_x == head_x and item_y != head_y:
+                    ray = 0 if item_y < head_y else 1
+                    cells = abs(item_y - head_y) // 10
+                elif item_y == head_y and item_x != head_x:
+                    ray = 2 if item_x < head_x else 3
+                    cells = abs(item_x - head_x) // 10
+                else:
+                    continue
+                if not distance[ray][kind] or cells < distance[ray][kind]:
+                    distance[ray][kind] = cells
+
+        for i, turn in enumerate((self.direction, LEFT_OF[self.direction], RIGHT_OF[self.direction])):
+            wall, body = distance[DIRECTIONS.index(turn)][:2]
+            features[i] = float(wall == 1 or body == 1)
+        i = 3
+        for ray in distance:
+            for cells in ray:
+                if cells:
+                    features[i] = 1.0 / cells
+                i += 1
+        return np.array(features, dtype=np.float32)
+
+    def get_observation(self):
+        if self.obs_mode == 'grid':
+            return self.get_grid_from_game()
+        if self.obs_mode == 'gray':
+            return self.get_gray_from_game()
+        if self.obs_mode == 'rays':
+            return self.get_rays_from_game()
+        return self.get_image_array_from_game()
+
+    def game_over(self, reward):
+        # TOUCH BOX
+        if not self.in_window(self.snake_pos):
+            return self.DEATH_REWARD, True
+
+        head = (self.snake_pos[1] // 10, self.snake_pos[0] // 10)
+        # TOUCH SELF: the head is already counted, any other segment on its cell is a collision
+        if self.body_grid[head] > 1:
+            return self.DEATH_REWARD, True
+
+        # TOUCH WALL
+        if self.wall_grid[head]:
+            return self.DEATH_REWARD, True
+
+        # LONGER THAN ALLOTED TIME
+        if self.steps >= self.STEP_LIMIT:
+            return 0, True
+
+        return reward, False
+
+    def reset(self):
+        if self.profile:
+            start = time.perf_counter()
+            obs = self.reset_game()
+            self.phase_calls['reset'] += 1
+            self.phase_time['reset'] += time.perf_counter() - start
+        else:
+            obs = self.reset_game()
+        if self.viewer is not None and self.viewer.due():
+            self.publish_frame()
+        return obs
+
+    def reset_game(self):
+        self.snake_pos = list(START_BODY[0])
+        self.snake_body = deque(map(list, START_BODY))
+        self.body_grid.fill(0)
+        for pos in self.snake_body:
+            self.body_grid[pos[1] // 10, pos[0] // 10] += 1
+
+        self.item_grid.fill(0)
+        self.index_free_cells()
+        self.food_items = []
+        self.poison_items = []
+        self.spawn_items()
+
+        self.direction = "RIGHT"
+        self.score = 0
+        self.steps = 0
+        if not self.observe:
+            self.frame_stale = True
+            return None
+        if self.obs_mode == 'rgb':
+            self.redraw_game_state()
+        return self.get_observation()
+
+    def render(self, mode='human'):
+        if mode == "human":
+            # With a viewer open, drawing is the viewer's job
+            if self.viewer is not None:
+                if self.viewer.due():
+                    self.publish_frame()
+                return
+            # pygame and SDL are only loaded once something is actually drawn
+            import pygame
+
+            if self.game_window is None:
+                self.game_window = pygame.display.set_mode((self.frame_size_x, self.frame_size_y))
+            # The frame is only kept up to date for RGB observations
+            if self.obs_mode != 'rgb' or self.frame_stale:
+                self.redraw_game_state()
+            # The frame is stored (y, x) while pygame surfaces are indexed (x, y)
+            pygame.surfarray.blit_array(self.game_window, self.frame.swapaxes(0, 1))
+            pygame.display.update()
+
+    def close(self):
+        self.close_viewer()
+        if self.profile and any(self.phase_calls.values()):
+            print(self.format_stats())
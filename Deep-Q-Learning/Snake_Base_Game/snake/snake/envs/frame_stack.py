@@ -0,0 +1,88 @@
+from collections import deque
+
+import numpy as np
+
+import gym
+from gym import spaces
+
+
+class LazyFrames():
+    '''
+    The last num_stack frames as references to the env's own observations. The stacked
+    array is only built when something asks for it, e.g. np.asarray(lazy_frames).
+    '''
+    __slots__ = ('frames',)
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __array__(self, dtype=None, copy=None):
+        stacked = np.stack(self.frames)
+        return stacked if dtype is None else stacked.astype(dtype)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    @property
+    def shape(self):
+        return (len(self.frames),) + self.frames[0].shape
+
+
+class FrameStack(gym.Wrapper):
+    '''
+    Returns the last num_stack observations of a snake env stacked along a new first axis,
+    oldest first, e.g. (4, 84, 84) for obs_mode='gray'. Like keras-rl's SequentialMemory,
+    the frames before the start of an episode are zeros.
+
+    By default the stack is a read-only view of a preallocated circular buffer. Each step
+    copies only the new frame, and the view is overwritten by the next step() or reset(),
+    so copy it if you need to keep it. With lazy=True each step returns LazyFrames instead.
+    They keep references to the last num_stack observations, stay valid, and only build
+    the stacked array when it is needed.
+    '''
+
+    def __init__(self, env, num_stack=4, lazy=False):
+        super().__init__(env)
+        self.num_stack = num_stack
+        self.lazy = lazy
+        space = env.observation_space
+        low = np.repeat(space.low[None], num_stack, axis=0)
+        high = np.repeat(space.high[None], num_stack, axis=0)
+        self.observation_space = spaces.Box(low, high, dtype=space.dtype)
+
+        # Every frame is written to slot and slot + num_stack, so the newest num_stack
+        # frames are always the contiguous block buffer[slot + 1:slot + 1 + num_stack]
+        self.buffer = np.zeros((2 * num_stack,) + space.shape, dtype=space.dtype)
+        self.views = []
+        for slot in range(num_stack):
+            view = self.buffer[slot + 1:slot + 1 + num_stack]
+            view.flags.writeable = False
+            self.views.append(view)
+        self.slot = num_stack - 1
+
+        self.zeros = np.zeros(space.shape, dtype=space.dtype)
+        self.zeros.flags.writeable = False
+        self.frames = deque(maxlen=num_stack)
+
+    def push(self, frame):
+        if self.lazy:
+            self.frames.append(frame)
+            return LazyFrames(tuple(self.frames))
+        self.slot = (self.slot + 1) % self.num_stack
+        self.buffer[self.slot] = frame
+        self.buffer[self.slot + self.num_stack] = frame
+        return self.views[self.slot]
+
+    def reset(self, **kwargs):
+        if self.lazy:
+            self.frames.extend([self.zeros] * self.num_stack)
+        else:
+            self.buffer.fill(0)
+        return self.push(self.env.reset(**kwargs))
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        return self.push(obs), reward, done, info
@@ -0,0 +1,182 @@
+'''
+Wall layouts, compiled once into the arrays the engine checks and spawns items with.
+
+A layout is given as wall positions, in pixels like SnakeEngine.wall_pos, and compiled by
+compile_layout() into a WallLayout. Compiled layouts are read-only and the last
+LAYOUT_CACHE_SIZE are cached, so envs with the same walls share one. Layouts come from a
+variant's spawn_wall(), a map file (load_layout()) or a seed (generate_layout()).
+
+Map files are plain text with one line per row of cells, '#' for a wall and '.' for an empty
+cell. Lines starting with ';' are comments:
+
+    ; a 2 cell wall in the top left corner
+    ....................
+    .##.................
+    ...
+'''
+import random
+from collections import namedtuple, deque
+from functools import lru_cache
+
+import numpy as np
+
+# walls: the wall positions as (x, y) tuples, sorted
+# mask: (rows, cols) bool array, True on walls
+# open_mask: (rows, cols) bool array, True where items may spawn, the spawn region without walls
+# open_cells: int16 array of the open_mask cells as flat indices y // 10 * cols + x // 10, ascending
+# wall_distance: (4, rows, cols) int8 array, the cells from every cell up, down, left and right
+#     to the first wall or the border, 1 if it is the next cell
+WallLayout = namedtuple('WallLayout', ['walls', 'mask', 'open_mask', 'open_cells', 'wall_distance'])
+
+WALL = '#'
+EMPTY = '.'
+COMMENT = ';'
+# Layouts kept by compile_layout() and generate_layout() each, about 7 KB apiece. Bounded, as a
+# server's clients can ask for any number of seeds
+LAYOUT_CACHE_SIZE = 1024
+
+
+def read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def compile_cached(walls, shape):
+    rows, cols = shape
+    mask = np.zeros(shape, dtype=bool)
+    for x, y in walls:
+        if x % 10 or y % 10 or not (0 <= x < cols * 10 and 0 <= y < rows * 10):
+            raise ValueError('Wall position %r is not a cell of a %dx%d board' % ((x, y), cols, rows))
+        mask[y // 10, x // 10] = True
+    # Items spawn on cells 1.. of both axes, never in the first row or column
+    open_mask = np.zeros(shape, dtype=bool)
+    open_mask[1:, 1:] = True
+    open_mask &= ~mask
+    open_cells = np.flatnonzero(open_mask).astype(np.int16)
+    return WallLayout(
+        walls, read_only(mask), read_only(open_mask), read_only(open_cells), read_only(wall_distance(mask)))
+
+
+def wall_distance(mask):
+    '''
+    Returns the wall_distance of a WallLayout with this mask, one sweep per direction
+    '''
+    rows, cols = mask.shape
+    distance = np.ones((4, rows, cols), dtype=np.int8)
+    for y in range(1, rows):
+        distance[0, y] = np.where(mask[y - 1], 1, distance[0, y - 1] + 1)
+    for y in range(rows - 2, -1, -1):
+        distance[1, y] = np.where(mask[y + 1], 1, distance[1, y + 1] + 1)
+    for x in range(1, cols):
+        distance[2, :, x] = np.where(mask[:, x - 1], 1, distance[2, :, x - 1] + 1)
+    for x in range(cols - 2, -1, -1):
+        distance[3, :, x] = np.where(mask[:, x + 1], 1, distance[3, :, x + 1] + 1)
+    return distance
+
+
+def compile_layout(walls, shape=(20, 20)):
+    '''
+    Returns the WallLayout of the wall positions walls on a board of shape (rows, cols) cells.
+    Layouts with the same walls are compiled once and shared.
+    '''
+    walls = tuple(sorted(set((int(x), int(y)) for x, y in walls)))
+    return compile_cached(walls, tuple(shape))
+
+
+def parse_map(text, shape=(20, 20)):
+    '''
+    Returns the wall positions of a map, see the module docstring for the format
+    '''
+    rows, cols = shape
+    lines = [line.rstrip('\n\r') for line in text.splitlines() if not line.startswith(COMMENT)]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if len(lines) != rows:
+        raise ValueError('A map needs %d rows, got %d' % (rows, len(lines)))
+    walls = []
+    for y, line in enumerate(lines):
+        if len(line) != cols or set(line) - {WALL, EMPTY}:
+            # The line itself is left out, the error may leave the process (see snake.envs.server)
+            raise ValueError("Map row %d must be %d characters of '%s' and '%s', got %d characters" % (y, cols, WALL, EMPTY, len(line)))
+        walls.extend((x * 10, y * 10) for x, char in enumerate(line) if char == WALL)
+    return walls
+
+
+def format_map(layout):
+    '''
+    Returns the map file text of a WallLayout
+    '''
+    return '\n'.join(''.join(WALL if wall else EMPTY for wall in row) for row in layout.mask) + '\n'
+
+
+def load_layout(path, shape=(20, 20)):
+    with open(path) as f:
+        return compile_layout(parse_map(f.read(), shape), shape)
+
+
+def connected(open_cells):
+    '''
+    Returns Boolean indicating if every True cell of open_cells can be reached from every other
+    '''
+    cells = np.argwhere(open_cells)
+    if not len(cells):
+        return True
+    seen = np.zeros_like(open_cells)
+    start = tuple(cells[0])
+    seen[start] = True
+    queue = deque([start])
+    reached = 1
+    rows, cols = open_cells.shape
+    while queue:
+        y, x = queue.popleft()
+        for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+            if 0 <= ny < rows and 0 <= nx < cols and open_cells[ny, nx] and not seen[ny, nx]:
+                seen[ny, nx] = True
+                reached += 1
+                queue.append((ny, nx))
+    return reached == len(cells)
+
+
+@lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def generate_cached(seed, shape, wall_count, keep_clear):
+    rng = random.Random(seed)
+    rows, cols = shape
+    mask = np.zeros(shape, dtype=bool)
+    clear = np.zeros(shape, dtype=bool)
+    for x, y in keep_clear:
+        clear[y // 10, x // 10] = True
+    count = 0
+    longest = max(2, min(shape) // 3)
+    for _ in range(100 * wall_count):
+        if count >= wall_count:
+            break
+        # Straight segments of 2 or more cells, so the walls look like walls and not like noise
+        length = rng.randint(2, longest)
+        dy, dx = (1, 0) if rng.random() < 0.5 else (0, 1)
+        y, x = rng.randrange(rows), rng.randrange(cols)
+        segment = [(y + i * dy, x + i * dx) for i in range(length)]
+        segment = [cell for cell in segment if cell[0] < rows and cell[1] < cols and not mask[cell] and not clear[cell]]
+        segment = segment[:wall_count - count]
+        if not segment:
+            continue
+        for cell in segment:
+            mask[cell] = True
+        # Never cut the board in two, every open cell stays reachable
+        if connected(~mask):
+            count += len(segment)
+        else:
+            for cell in segment:
+                mask[cell] = False
+    walls = [(x * 10, y * 10) for y, x in np.argwhere(mask)]
+    return compile_layout(walls, shape)
+
+
+def generate_layout(seed, shape=(20, 20), wall_count=40, keep_clear=()):
+    '''
+    Returns a WallLayout of about wall_count wall cells in straight segments, placed from seed.
+    Every open cell stays reachable from every other, and the positions in keep_clear, e.g.
+    where the snake starts, stay empty. The same arguments always give the same, shared layout.
+    '''
+    keep_clear = tuple(sorted(set((int(x), int(y)) for x, y in keep_clear)))
+    return generate_cached(seed, tuple(shape), wall_count, keep_clear)
@@ -0,0 +1,147 @@
+import random
+
+import numpy as np
+
+import gym
+
+
+def pack_actions(actions):
+    '''
+    Packs actions 0..3 into 2 bits each, four actions per byte
+    '''
+    actions = np.asarray(actions, dtype=np.uint8)
+    padded = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    padded[:len(actions)] = actions
+    quads = padded.reshape(-1, 4)
+    return quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6
+
+
+def unpack_actions(packed, length):
+    packed = np.asarray(packed, dtype=np.uint8)
+    return np.stack([(packed >> shift) & 3 for shift in (0, 2, 4, 6)], axis=1).ravel()[:length]
+
+
+class EpisodeLog():
+    '''
+    Episodes stored as the seed their env was reset with and their actions, which is all it
+    takes to play them again exactly (see snake.envs.replay). Also keeps the length, final score
+    and return of every episode to check replays against and to pick episodes without replaying.
+
+    env_id is the "module.Class" of the env, step_limit its STEP_LIMIT and frame_skip its
+    frame_skip, since an action of the log is repeated that many ticks. walls are the env's
+    wall positions, which EpisodeRecorder always stores, even the variant's own. They are only
+    None in logs saved before layouts existed, which replay with the variant's own walls.
+    '''
+
+    def __init__(self, env_id, step_limit, frame_skip=1, walls=None):
+        self.env_id = env_id
+        self.step_limit = step_limit
+        self.frame_skip = frame_skip
+        self.walls = walls
+        self.seeds = []
+        self.lengths = []
+        self.scores = []
+        self.returns = []
+        self.packed = []
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def append(self, seed, actions, score, episode_return):
+        self.seeds.append(seed)
+        self.lengths.append(len(actions))
+        self.scores.append(score)
+        self.returns.append(episode_return)
+        self.packed.append(pack_actions(actions))
+
+    def actions(self, index):
+        return unpack_actions(self.packed[index], self.lengths[index])
+
+    def save(self, path):
+        '''
+        Writes the log to a compressed .npz file, every episode costs about 20 bytes
+        plus a quarter byte per step before compression
+        '''
+        arrays = dict(
+            env_id=np.array(self.env_id),
+            step_limit=np.array(self.step_limit),
+            frame_skip=np.array(self.frame_skip),
+            seeds=np.array(self.seeds, dtype=np.uint32),
+            lengths=np.array(self.lengths, dtype=np.int32),
+            scores=np.array(self.scores, dtype=np.int32),
+            returns=np.array(self.returns, dtype=np.float64),
+            actions=np.concatenate(self.packed) if self.packed else np.zeros(0, dtype=np.uint8),
+        )
+        if self.walls is not None:
+            arrays['walls'] = np.array(self.walls, dtype=np.int16).reshape(-1, 2)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            # Logs written before frame skipping or layouts existed have no frame_skip or walls
+            frame_skip = int(data['frame_skip']) if 'frame_skip' in data.files else 1
+            walls = [tuple(pos) for pos in data['walls'].tolist()] if 'walls' in data.files else None
+            log = cls(str(data['env_id']), int(data['step_limit']), frame_skip, walls)
+            log.seeds = data['seeds'].tolist()
+            log.lengths = data['lengths'].tolist()
+            log.scores = data['scores'].tolist()
+            log.returns = data['returns'].tolist()
+            # Every episode was packed on its own, so it starts on a byte boundary
+            ends = np.cumsum([-(-length // 4) for length in log.lengths], dtype=np.int64)
+            log.packed = np.split(data['actions'], ends[:-1]) if len(ends) else []
+        return log
+
+
+class EpisodeRecorder(gym.Wrapper):
+    '''
+    Records every episode of a snake env into an EpisodeLog instead of keeping its frames.
+
+    Each reset() seeds the env with a fresh 32 bit seed drawn from seed, so an episode is fully
+    described by that seed and its actions. An episode is added to the log when it is done,
+    or when reset() or close() cuts it short. save() writes the finished episodes.
+    '''
+
+    def __init__(self, env, seed=None):
+        super().__init__(env)
+        engine = env.unwrapped
+        self.rng = random.Random(seed)
+        self.log = EpisodeLog(
+            '%s.%s' % (type(engine).__module__, type(engine).__name__), engine.STEP_LIMIT, engine.frame_skip, engine.wall_pos)
+        self.episode_seed = None
+        self.actions = None
+
+    def finish_episode(self):
+        if self.actions:
+            self.log.append(self.episode_seed, self.actions, self.score, self.episode_return)
+        self.actions = None
+
+    def reset(self, **kwargs):
+        self.finish_episode()
+        self.episode_seed = self.rng.getrandbits(32)
+        self.env.unwrapped.seed(self.episode_seed)
+        obs = self.env.reset(**kwargs)
+        self.actions = bytearray()
+        self.score = 0
+        self.episode_return = 0
+        return obs
+
+    def step(self, action):
+        if self.actions is None:
+            raise RuntimeError('Call reset() before step(), the last episode is over')
+        if action not in (0, 1, 2, 3):
+            raise ValueError('EpisodeRecorder can only record the actions 0..3, got %r' % (action,))
+        obs, reward, done, info = self.env.step(action)
+        self.actions.append(int(action))
+        self.score = info["score"]
+        self.episode_return += reward
+        if done:
+            self.finish_episode()
+        return obs, reward, done, info
+
+    def save(self, path):
+        self.log.save(path)
+
+    def close(self):
+        self.finish_episode()
+        return super().close()
@@ -0,0 +1,131 @@
+'''
+Plays episodes recorded by EpisodeRecorder again, step for step, to get back any frame,
+score trace or video without having stored them.
+
+    python -m snake.envs.replay episodes.npz                      lists the episodes
+    python -m snake.envs.replay episodes.npz --verify             replays all and checks them
+    python -m snake.envs.replay episodes.npz -e 3 --scores        prints the score trace
+    python -m snake.envs.replay episodes.npz -e 3 --frame 10 --out frame.png
+    python -m snake.envs.replay episodes.npz -e 3 --video episode.gif
+'''
+import argparse, importlib
+
+import numpy as np
+
+from snake.envs.recorder import EpisodeLog
+
+
+def make_env(log, obs_mode='grid', observe=True):
+    '''
+    Builds an env of the recorded variant, grid observations are the cheapest to replay with
+    and observe=False skips them altogether
+    '''
+    module, name = log.env_id.rsplit('.', 1)
+    env = getattr(importlib.import_module(module), name)(obs_mode, frame_skip=log.frame_skip, layout=log.walls, observe=observe)
+    env.STEP_LIMIT = log.step_limit
+    return env
+
+
+def replay(log, index, env=None):
+    '''
+    Yields (observation, reward, done, info) of episode index, starting with the reset
+    observation as (observation, 0, False, {"score": 0}). Observations are None if env
+    was made with observe=False
+    '''
+    if env is None:
+        env = make_env(log)
+    env.seed(log.seeds[index])
+    yield env.reset(), 0, False, {"score": 0}
+    for action in log.actions(index):
+        yield env.step(int(action))
+
+
+def frames(log, index):
+    '''
+    Yields the (200, 200, 3) RGB frame of every step of episode index, starting with the reset
+    '''
+    env = make_env(log, observe=False)
+    for _ in replay(log, index, env):
+        env.redraw_game_state()
+        yield env.get_image_array_from_game()
+
+
+def frame(log, index, step):
+    '''
+    Returns the RGB frame after step steps of episode index, 0 is the frame after reset
+    '''
+    if not 0 <= step <= log.lengths[index]:
+        raise ValueError('Episode %d has %d steps, got step %d' % (index, log.lengths[index], step))
+    env = make_env(log, observe=False)
+    for i, _ in enumerate(replay(log, index, env)):
+        if i == step:
+            env.redraw_game_state()
+            return env.get_image_array_from_game()
+
+
+def score_trace(log, index):
+    '''
+    Returns the score after every step of episode index, starting with 0 after reset
+    '''
+    return np.array([info["score"] for _, _, _, info in replay(log, index, make_env(log, observe=False))])
+
+
+def verify(log, index):
+    '''
+    Returns Boolean indicating if replaying episode index ends where the recording did
+    '''
+    length = -1
+    episode_return = 0
+    for length, (_, reward, _, info) in enumerate(replay(log, index, make_env(log, observe=False))):
+        episode_return += reward
+    return length == log.lengths[index] and info["score"] == log.scores[index] and episode_return == log.returns[index]
+
+
+def write_video(log, index, path, fps=10):
+    '''
+    Writes episode index as an animated GIF, needs Pillow
+    '''
+    from PIL import Image
+
+    images = [Image.fromarray(image) for image in frames(log, index)]
+    images[0].save(path, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', help='.npz file written by EpisodeRecorder.save()')
+    parser.add_argument('-e', '--episode', type=int, help='episode index')
+    parser.add_argument('--verify', action='store_true', help='replay every episode and check it')
+    parser.add_argument('--scores', action='store_true', help='print the score after every step')
+    parser.add_argument('--frame', type=int, help='save the frame after this many steps to --out')
+    parser.add_argument('--out', default='frame.png')
+    parser.add_argument('--video', help='write the episode to this GIF file')
+    parser.add_argument('--fps', type=int, default=10)
+    args = parser.parse_args()
+
+    log = EpisodeLog.load(args.log)
+    if args.verify:
+        failed = [index for index in range(len(log)) if not verify(log, index)]
+        print('%d of %d episodes replayed exactly' % (len(log) - len(failed), len(log)))
+        if failed:
+            print('Mismatched episodes: %s' % failed)
+            raise SystemExit(1)
+        return
+    if args.episode is None:
+        print('%s, STEP_LIMIT %d, frame_skip %d, %d episodes' % (log.env_id, log.step_limit, log.frame_skip, len(log)))
+        for index in range(len(log)):
+            print('%6d  seed %10d  steps %5d  score %4d  return %8g' % (
+                index, log.seeds[index], log.lengths[index], log.scores[index], log.returns[index]))
+        return
+    if args.scores:
+        print(' '.join(map(str, score_trace(log, args.episode))))
+    if args.frame is not None:
+        from PIL import Image
+
+        Image.fromarray(frame(log, args.episode, args.frame)).save(args.out)
+    if args.video:
+        write_video(log, args.episode, args.video, args.fps)
+
+
+if __name__ == '__main__':
+    main()
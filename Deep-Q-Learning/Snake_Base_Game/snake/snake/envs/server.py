@@ -0,0 +1,331 @@
+'''
+Hosts many headless snake games in one asyncio process and serves them over a local socket.
+
+The protocol is newline delimited JSON, one object per line. Requests name a "cmd" and may carry
+an "id", which the reply echoes. Requests without an id get no reply unless they fail.
+
+    {"cmd": "open", "variant": "snake", "seed": 3}  -> {"session", "size", "walls", "state"}
+    {"cmd": "reset", "session": 1}                  -> {"state"}
+    {"cmd": "step", "session": 1, "action": 2}      -> {"reward", "done", "state"}
+    {"cmd": "step_many", "actions": {"1": 2}}       -> {"results": {"1": {"reward", "done", "state"}}}
+    {"cmd": "act", "session": 1, "action": 2}       sets the action of the next tick
+    {"cmd": "close", "session": 1}                  -> {}
+    {"cmd": "stats"}                                -> {"sessions", "ticks", "steps"}
+
+"open" also takes a "layout", a seed or the name of one of the variant's maps, e.g. "maze"
+for "walls", see SnakeEngine.make_layout(). Paths are not accepted, clients cannot make the
+server read its files. Sessions with the same layout share its compiled walls.
+
+Sessions can only be used by the connection that opened them. A "step_many" with an unknown
+session or a bad action steps none of its sessions. Failed requests are answered with
+{"error": message}. A state is {"body", "food", "poison", "score", "steps"}, positions are
+cell indices y * 20 + x and the body is listed head first.
+
+With tick_rate > 0 the host also steps every session tick_rate times per second, with the
+action set by "act" or else the current direction, resets finished games, and sends every
+connection one {"tick", "updates": {session: {"reward", "done", "state"}}} line per tick.
+Connections that stop reading them are dropped.
+
+    python -m snake.envs.server --port 8765 --tick-rate 10
+    python -m snake.envs.server --measure 1000
+'''
+import argparse, asyncio, importlib, itertools, json, os, time, tracemalloc
+
+VARIANTS = {
+    'snake': 'snake.envs.snake_env',
+    'poison': 'poison.envs.snake_env',
+    'poison_triple': 'poison_triple.envs.snake_env',
+    'walls': 'walls.envs.snake_env',
+}
+# Longest line either side reads, a step_many over thousands of sessions is far above asyncio's 64 KB default
+LINE_LIMIT = 1 << 26
+# Unsent tick updates a connection may pile up, a client this far behind has stopped reading and is dropped
+WRITE_BUFFER_LIMIT = 1 << 24
+# Action that keeps a snake going its current way
+DIRECTION_ACTIONS = {'UP': 0, 'DOWN': 1, 'LEFT': 2, 'RIGHT': 3}
+
+
+def cell(env, pos):
+    return pos[1] // 10 * (env.frame_size_x // 10) + pos[0] // 10
+
+
+def check_action(action):
+    if type(action) is not int or not 0 <= action < 4:
+        raise ValueError('An action must be 0, 1, 2 or 3, got %r' % (action,))
+    return action
+
+
+def env_class(variant):
+    if variant not in VARIANTS:
+        raise ValueError('Unknown variant %r, expected one of %s' % (variant, ', '.join(VARIANTS)))
+    return importlib.import_module(VARIANTS[variant]).SnakeEnv
+
+
+def client_layout(variant, layout):
+    '''
+    Returns the layout a client asked for as make_layout() takes it: None, a seed, or the path
+    of a map in the variant's MAP_DIR. Anything else, such as a path, raises a ValueError
+    '''
+    if layout is None or (isinstance(layout, int) and not isinstance(layout, bool)):
+        return layout
+    if not isinstance(layout, str):
+        raise ValueError('A layout must be a seed or a map name, got %s' % type(layout).__name__)
+    map_dir = env_class(variant).MAP_DIR
+    if map_dir is None:
+        raise ValueError('Variant %r has no maps, use a seed' % (variant,))
+    map_dir = os.path.realpath(map_dir)
+    path = os.path.realpath(os.path.join(map_dir, '%s.txt' % (layout,)))
+    separators = [sep for sep in (os.sep, os.altsep) if sep]
+    if (not layout or '..' in layout or any(sep in layout for sep in separators)
+            or os.path.dirname(path) != map_dir or not os.path.isfile(path)):
+        raise ValueError('Unknown map %r, expected one of %s' % (layout, ', '.join(sorted(
+            name[:-len('.txt')] for name in os.listdir(map_dir) if name.endswith('.txt')))))
+    return path
+
+
+def session_state(env):
+    return {
+        "body": [cell(env, pos) for pos in env.snake_body],
+        "food": [cell(env, pos) for pos in env.food_items],
+        "poison": [cell(env, pos) for pos in env.poison_items],
+        "score": env.score,
+        "steps": env.steps,
+    }
+
+
+class Session():
+    __slots__ = ('id', 'env', 'owner', 'action')
+
+    def __init__(self, id, env, owner):
+        self.id = id
+        self.env = env
+        self.owner = owner
+        self.action = None
+
+
+class SessionHost():
+    '''
+    Owns the games. Sessions are plain envs that build no observations, clients get the
+    game state instead, and each belongs to the connection (owner) that opened it. Only its
+    owner can step, reset, act on or close a session, to any other it is unknown.
+    '''
+
+    def __init__(self, tick_rate=0):
+        self.tick_rate = tick_rate
+        self.sessions = {}
+        self.ids = itertools.count(1)
+        self.ticks = 0
+        self.steps = 0
+        # Open connections, tick updates are only sent to these
+        self.writers = set()
+
+    def open(self, variant='snake', seed=None, owner=None, layout=None):
+        '''
+        Opens a session, layout is anything make_layout() takes. Requests go through client_layout() first
+        '''
+        try:
+            env = env_class(variant)('grid', layout=layout, observe=False)
+        except OSError as e:
+            raise ValueError('Cannot load layout %r: %s' % (layout, e.strerror))
+        if seed is not None:
+            env.seed(seed)
+            env.reset()
+        session = Session(next(self.ids), env, owner)
+        self.sessions[session.id] = session
+        return session
+
+    def get(self, session_id, owner=None):
+        try:
+            session = self.sessions[int(session_id)]
+        except (KeyError, ValueError, TypeError):
+            session = None
+        if session is None or session.owner is not owner:
+            raise ValueError('Unknown session %r' % (session_id,))
+        return session
+
+    def step(self, session_id, action, owner=None):
+        env = self.get(session_id, owner).env
+        _, reward, done, _ = env.step(check_action(action))
+        self.steps += 1
+        return {"reward": reward, "done": done, "state": session_state(env)}
+
+    def step_many(self, actions, owner=None):
+        '''
+        Steps every session in actions, a {session_id: action} dict. Every session and action is
+        checked first, so either all of them step or, if one is wrong, none does
+        '''
+        sessions = [(session_id, self.get(session_id, owner), check_action(action)) for session_id, action in actions.items()]
+        results = {}
+        for session_id, session, action in sessions:
+            _, reward, done, _ = session.env.step(action)
+            results[session_id] = {"reward": reward, "done": done, "state": session_state(session.env)}
+        self.steps += len(sessions)
+        return results
+
+    def reset(self, session_id, owner=None):
+        env = self.get(session_id, owner).env
+        env.reset()
+        return {"state": session_state(env)}
+
+    def close(self, session_id, owner=None):
+        self.sessions.pop(self.get(session_id, owner).id).env.close()
+
+    def close_owner(self, owner):
+        for session in [session for session in self.sessions.values() if session.owner is owner]:
+            del self.sessions[session.id]
+            session.env.close()
+
+    def tick(self):
+        '''
+        Steps every session once and returns their updates grouped by owner
+        '''
+        updates = {}
+        for session in self.sessions.values():
+            env = session.env
+            action = session.action if session.action is not None else DIRECTION_ACTIONS[env.direction]
+            session.action = None
+            _, reward, done, _ = env.step(action)
+            update = {"reward": reward, "done": done, "state": session_state(env)}
+            if done:
+                env.reset()
+                update["next"] = session_state(env)
+            updates.setdefault(session.owner, {})[session.id] = update
+        self.ticks += 1
+        self.steps += len(self.sessions)
+        return updates
+
+    def handle(self, request, owner):
+        '''
+        Runs one request and returns the reply fields
+        '''
+        cmd = request.get("cmd")
+        if cmd == "open":
+            variant = request.get("variant", "snake")
+            session = self.open(variant, request.get("seed"), owner, client_layout(variant, request.get("layout")))
+            env = session.env
+            return {
+                "session": session.id,
+                "size": [env.frame_size_y // 10, env.frame_size_x // 10],
+                "walls": [cell(env, pos) for pos in env.wall_pos],
+                "state": session_state(env),
+            }
+        if cmd == "reset":
+            return self.reset(request["session"], owner)
+        if cmd == "step":
+            return self.step(request["session"], request["action"], owner)
+        if cmd == "step_many":
+            return {"results": self.step_many(request["actions"], owner)}
+        if cmd == "act":
+            self.get(request["session"], owner).action = check_action(request["action"])
+            return {}
+        if cmd == "close":
+            self.close(request["session"], owner)
+            return {}
+        if cmd == "stats":
+            return {"sessions": len(self.sessions), "ticks": self.ticks, "steps": self.steps}
+        raise ValueError('Unknown cmd %r' % (cmd,))
+
+    async def handle_connection(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    reply = self.handle(request, writer)
+                except KeyError as e:
+                    reply = {"error": 'Missing field %s' % e}
+                except (ValueError, TypeError, AttributeError) as e:
+                    reply = {"error": str(e)}
+                else:
+                    if "id" not in request:
+                        continue
+                if isinstance(request, dict) and "id" in request:
+                    reply["id"] = request["id"]
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            self.close_owner(writer)
+            writer.close()
+
+    async def run_ticks(self):
+        '''
+        Steps every session tick_rate times per second and sends each connection its updates.
+        Connections that leave more than WRITE_BUFFER_LIMIT bytes of them unsent are dropped
+        '''
+        interval = 1.0 / self.tick_rate
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            for writer, updates in self.tick().items():
+                if writer not in self.writers:
+                    continue
+                if writer.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+                    # Ends handle_connection(), which closes the connection's sessions
+                    self.writers.discard(writer)
+                    writer.transport.abort()
+                    continue
+                writer.write(json.dumps({"tick": self.ticks, "updates": updates}).encode() + b'\n')
+            next_tick += interval
+            # A slow tick is not made up for, the schedule just moves on
+            next_tick = max(next_tick, loop.time())
+            await asyncio.sleep(next_tick - loop.time())
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=LINE_LIMIT)
+        ticker = asyncio.ensure_future(self.run_ticks()) if self.tick_rate else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if ticker is not None:
+                ticker.cancel()
+
+
+def measure_sessions(count, variant='snake', steps=100):
+    '''
+    Returns the bytes of memory every open session costs after steps ticks
+    '''
+    host = SessionHost()
+    host.open(variant).env.close()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(count):
+        host.open(variant, owner=None)
+    start = time.perf_counter()
+    for _ in range(steps):
+        host.tick()
+    elapsed = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / count, count * steps / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tick-rate', type=float, default=0, help='ticks per second, 0 only steps on request')
+    parser.add_argument('--measure', type=int, metavar='SESSIONS', help='print the memory per session and exit')
+    parser.add_argument('--variant', choices=list(VARIANTS), default='snake')
+    args = parser.parse_args()
+
+    if args.measure:
+        per_session, rate = measure_sessions(args.measure, args.variant)
+        print('%d %s sessions: %.1f KB per session, %.0f session steps/s while ticking (traced)' % (
+            args.measure, args.variant, per_session / 1024, rate))
+        return
+    try:
+        asyncio.run(SessionHost(args.tick_rate).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
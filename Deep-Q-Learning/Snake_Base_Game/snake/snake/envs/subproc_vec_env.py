@@ -0,0 +1,156 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import gym
+
+
+def worker(remote, parent_remote, env_id, env_kwargs, shm_name, index, shape, dtype):
+    '''
+    Runs one env in its own process. Observations go straight into this worker's slot of the
+    shared memory block, only actions, rewards, dones and infos travel through the pipe.
+    '''
+    parent_remote.close()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slot = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=index * int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    env = None
+    try:
+        env = gym.make(env_id, **env_kwargs)
+        while True:
+            cmd, data = remote.recv()
+            if cmd == 'step':
+                obs, reward, done, info = env.step(data)
+                if done:
+                    # Auto reset, info still holds the final score of the finished episode
+                    obs = env.reset()
+                # None with observe=False, there is nothing to write
+                if obs is not None:
+                    slot[...] = obs
+                remote.send((True, (reward, done, info)))
+            elif cmd == 'reset':
+                obs = env.reset()
+                if obs is not None:
+                    slot[...] = obs
+                remote.send((True, None))
+            elif cmd == 'seed':
+                remote.send((True, env.seed(data)))
+            elif cmd == 'close':
+                remote.send((True, None))
+                break
+            else:
+                raise RuntimeError('Unknown command %r' % (cmd,))
+    except Exception as e:
+        remote.send((False, e))
+    finally:
+        if env is not None:
+            env.close()
+        del slot
+        shm.close()
+        remote.close()
+
+
+class SubprocVecEnv():
+    '''
+    Runs num_envs copies of a registered snake env, e.g. "snake:snake-v0", "poison:poison-v0",
+    "poison_triple:poison_triple_v0" or "walls:walls_v0", each in its own worker process.
+
+    Workers write their observations into one multiprocessing.shared_memory block of shape
+    (num_envs,) + observation_space.shape, so frames are never pickled. step_async() sends the
+    actions and returns right away, step_wait() blocks until every worker has stepped.
+    Finished episodes are reset by their worker, the observation returned for them is the first
+    of the next episode and their info dict holds the final score.
+
+    With copy=False the observations returned are a view of the shared block, which the next
+    step_async() or reset() overwrites. With observe=False in env_kwargs the workers build no
+    observations, and reset() and step() return None in place of them, as the envs do.
+    '''
+
+    def __init__(self, env_id, num_envs, env_kwargs=None, copy=True, context=None):
+        self.env_id = env_id
+        self.num_envs = num_envs
+        self.env_kwargs = env_kwargs or {}
+        self.copy = copy
+        self.observe = self.env_kwargs.get('observe', True)
+
+        # One throwaway env in this process tells us the spaces and the size of the shared block
+        dummy = gym.make(env_id, **self.env_kwargs)
+        self.action_space = dummy.action_space
+        self.observation_space = dummy.observation_space
+        dummy.close()
+        shape = self.observation_space.shape
+        dtype = np.dtype(self.observation_space.dtype)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=num_envs * int(np.prod(shape)) * dtype.itemsize)
+        self.observations = np.ndarray((num_envs,) + shape, dtype=dtype, buffer=self.shm.buf)
+
+        ctx = mp.get_context(context)
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(num_envs)])
+        self.processes = []
+        for index, (work_remote, remote) in enumerate(zip(self.work_remotes, self.remotes)):
+            args = (work_remote, remote, env_id, self.env_kwargs, self.shm.name, index, shape, dtype)
+            process = ctx.Process(target=worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+        self.waiting = False
+        self.closed = False
+
+    def receive(self):
+        results = []
+        for remote in self.remotes:
+            success, result = remote.recv()
+            if not success:
+                raise result
+            results.append(result)
+        return results
+
+    def get_observations(self):
+        if not self.observe:
+            return None
+        return self.observations.copy() if self.copy else self.observations
+
+    def seed(self, seed=None):
+        '''
+        Seeds worker i with seed + i, or every worker from fresh entropy if seed is None
+        '''
+        for index, remote in enumerate(self.remotes):
+            remote.send(('seed', None if seed is None else seed + index))
+        return [result[0] for result in self.receive()]
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(('reset', None))
+        self.receive()
+        return self.get_observations()
+
+    def step_async(self, actions):
+        for remote, action in zip(self.remotes, actions):
+            remote.send(('step', int(action)))
+        self.waiting = True
+
+    def step_wait(self):
+        results = self.receive()
+        self.waiting = False
+        rewards, dones, infos = zip(*results)
+        return self.get_observations(), np.array(rewards), np.array(dones), list(infos)
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            self.receive()
+        for remote in self.remotes:
+            remote.send(('close', None))
+        self.receive()
+        for process in self.processes:
+            process.join()
+        # Drop our view before releasing the block
+        del self.observations
+        self.shm.close()
+        self.shm.unlink()
+        self.closed = True
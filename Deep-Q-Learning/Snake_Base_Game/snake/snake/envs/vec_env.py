@@ -0,0 +1,217 @@
+import numpy as np
+
+from gym import spaces
+
+from snake.envs.engine import BLACK, WHITE, GREEN
+from snake.envs.snake_env import SnakeEnv
+
+# Directions share the action codes: 0 UP, 1 DOWN, 2 LEFT, 3 RIGHT
+# so the opposite of a direction is always direction ^ 1
+MOVES = np.array([[0, -1], [0, 1], [-1, 0], [1, 0]])
+
+
+class VecSnakeEnv():
+    '''
+    Steps num_envs snake-v0 games in lockstep.
+
+    Every game keeps the exact rules and rewards of SnakeEnv, but the heads, bodies, directions,
+    food positions and step counters of all games live in NumPy arrays and are updated
+    with batched operations, so one step() call advances every game at once.
+    Finished games are reset automatically: the observation returned for them is the
+    first frame of the next episode and info["score"] holds the final score.
+
+    The returned observations are the env's own (num_envs, 200, 200, 3) buffer, which
+    is overwritten by the next step() or reset(). Copy it if you need to keep it.
+    '''
+
+    def __init__(self, num_envs, seed=None):
+        self.num_envs = num_envs
+        self.action_space = spaces.Discrete(4)
+        self.observation_space = spaces.Box(0, 255, shape=(200, 200, 3), dtype=np.uint8)
+        self.frame_size_x = 200
+        self.frame_size_y = 200
+        self.cols = self.frame_size_x // 10
+        self.rows = self.frame_size_y // 10
+        self.STEP_LIMIT = 1000
+
+        # Each body is a ring buffer of flat cell indices (y * cols + x), the head sits at head_ptr
+        self.capacity = self.rows * self.cols + 2
+        self.body = np.zeros((num_envs, self.capacity), dtype=np.int64)
+        self.head_ptr = np.zeros(num_envs, dtype=np.int64)
+        self.length = np.zeros(num_envs, dtype=np.int64)
+        # Number of body segments on every cell, used for the self collision check
+        self.occupancy = np.zeros((num_envs, self.rows * self.cols), dtype=np.uint8)
+        # Same spawn region as SnakeEnv: cells 1..19 of both axes
+        self.spawn_region = np.zeros((self.rows, self.cols), dtype=bool)
+        self.spawn_region[1:, 1:] = True
+        self.spawn_region = self.spawn_region.ravel()
+        # Per game free cell index like SnakeEnv's: the first free_count[game] entries of
+        # free_cells[game] are the free cells, free_slot[game] maps every cell to its entry or -1
+        self.free_cells = np.zeros((num_envs, self.rows * self.cols), dtype=np.int64)
+        self.free_slot = np.full((num_envs, self.rows * self.cols), -1, dtype=np.int64)
+        self.free_count = np.zeros(num_envs, dtype=np.int64)
+
+        self.head = np.zeros((num_envs, 2), dtype=np.int64)
+        self.direction = np.zeros(num_envs, dtype=np.int64)
+        self.food = np.zeros((num_envs, 2), dtype=np.int64)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+
+        self.frames = np.zeros((num_envs, self.frame_size_y, self.frame_size_x, 3), dtype=np.uint8)
+        # Same memory as frames, indexed by (game, cell y, pixel y, cell x, pixel x, channel)
+        self.blocks = self.frames.reshape(num_envs, self.rows, 10, self.cols, 10, 3)
+        self.all_games = np.arange(num_envs)
+
+        self.seed(seed)
+        self.reset()
+
+    def seed(self, seed=None):
+        '''
+        Gives every game its own independent random stream derived from seed
+        '''
+        seed_seq = np.random.SeedSequence(seed)
+        self.rngs = [np.random.default_rng(child) for child in seed_seq.spawn(self.num_envs)]
+        return [seed_seq.entropy]
+
+    def occupy(self, games, cells):
+        '''
+        Swap-removes cells from the free cell index, at most one cell per game
+        '''
+        slots = self.free_slot[games, cells]
+        listed = slots >= 0
+        games, cells, slots = games[listed], cells[listed], slots[listed]
+        self.free_count[games] -= 1
+        last = self.free_cells[games, self.free_count[games]]
+        self.free_cells[games, slots] = last
+        self.free_slot[games, last] = slots
+        self.free_slot[games, cells] = -1
+
+    def release(self, games, cells):
+        '''
+        Appends cells to the free cell index, at most one cell per game
+        '''
+        slots = self.free_count[games]
+        self.free_cells[games, slots] = cells
+        self.free_slot[games, cells] = slots
+        self.free_count[games] += 1
+
+    def spawn_food(self, game):
+        '''
+        Moves the food of game to a cell drawn uniformly from its free cells, like SnakeEnv.spawn_item.
+        If the snake fills the board there is no cell left, and like SnakeEnv the game goes on
+        without food: its position becomes (-1, -1), which no head can reach and is never painted
+        '''
+        if self.free_count[game] == 0:
+            self.food[game] = -1
+            return
+        cell = self.free_cells[game, self.rngs[game].integers(self.free_count[game])]
+        self.occupy(np.array([game]), np.array([cell]))
+        self.food[game] = cell % self.cols, cell // self.cols
+
+    def paint(self, games, x, y, color):
+        self.blocks[games, y, :, x, :] = color
+
+    def reset_games(self, games):
+        '''
+        Puts the given games back at the SnakeEnv starting position and repaints their frames
+        '''
+        start = np.array([[10, 5], [9, 5], [8, 5]])
+        start_cells = start[:, 1] * self.cols + start[:, 0]
+
+        self.head[games] = start[0]
+        self.direction[games] = 3
+        self.occupancy[games] = 0
+        self.occupancy[games[:, None], start_cells] = 1
+        # Tail first so that the head ends up at head_ptr
+        self.body[games, :3] = start_cells[::-1]
+        self.head_ptr[games] = 2
+        self.length[games] = 3
+        self.score[games] = 0
+        self.steps[games] = 0
+
+        # Free cells first, in cell order, the rest after them
+        free = self.spawn_region & (self.occupancy[games] == 0)
+        order = np.argsort(~free, axis=1, kind='stable')
+        self.free_count[games] = free.sum(axis=1)
+        self.free_cells[games] = order
+        slots = np.where(np.arange(self.rows * self.cols) < self.free_count[games, None], np.arange(self.rows * self.cols), -1)
+        self.free_slot[games[:, None], order] = slots
+        for game in games:
+            self.spawn_food(game)
+
+        self.frames[games] = 0
+        body_games = np.repeat(games, len(start))
+        self.paint(body_games, np.tile(start[:, 0], len(games)), np.tile(start[:, 1], len(games)), GREEN)
+        self.paint(games, self.food[games, 0], self.food[games, 1], WHITE)
+
+    def reset(self):
+        self.reset_games(self.all_games)
+        return self.frames
+
+    def step(self, actions):
+        games = self.all_games
+        actions = np.asarray(actions)
+
+        # change_direction: any action except a full reversal is taken
+        self.direction = np.where(actions != self.direction ^ 1, actions, self.direction)
+        # move
+        self.head += MOVES[self.direction]
+        x = self.head[:, 0]
+        y = self.head[:, 1]
+        inside = (x >= 0) & (x < self.cols) & (y >= 0) & (y < self.rows)
+        cell = np.where(inside, y * self.cols + x, 0)
+
+        # food_handler: eat, or drop the tail
+        ate = inside & (x == self.food[:, 0]) & (y == self.food[:, 1])
+        popped = np.flatnonzero(~ate)
+        tail = self.body[popped, (self.head_ptr[popped] - self.length[popped] + 1) % self.capacity]
+        self.occupancy[popped, tail] -= 1
+        self.length[popped] -= 1
+        # A vacated tail cell is free again unless the food sits on it
+        food_cells = self.food[popped, 1] * self.cols + self.food[popped, 0]
+        freed = (self.occupancy[popped, tail] == 0) & self.spawn_region[tail] & (tail != food_cells)
+        self.release(popped[freed], tail[freed])
+        # The head cell is taken before the new food is drawn
+        inside_games = np.flatnonzero(inside)
+        self.occupy(inside_games, cell[inside_games])
+        self.score += ate
+        for game in np.flatnonzero(ate):
+            self.spawn_food(game)
+
+        # game_over: the head may only collide with what is left of the body after the tail moved
+        collided = inside & (self.occupancy[games, cell] > 0)
+        dead = ~inside | collided
+        timeout = ~dead & (self.steps >= self.STEP_LIMIT)
+        done = dead | timeout
+        rewards = np.where(dead, SnakeEnv.DEATH_REWARD, np.where(timeout, 0, ate * SnakeEnv.FOOD_REWARD))
+
+        # Insert the new head
+        self.head_ptr = (self.head_ptr + 1) % self.capacity
+        self.body[games, self.head_ptr] = cell
+        self.length += 1
+        self.occupancy[games, cell] += inside
+        self.steps += 1
+        scores = self.score.copy()
+
+        # Only the vacated tail, the new head and a respawned food change on screen
+        live = ~done
+        live_popped = live[popped]
+        tail_games = popped[live_popped]
+        tail = tail[live_popped]
+        self.paint(tail_games, tail % self.cols, tail // self.cols, BLACK)
+        live_games = np.flatnonzero(live)
+        self.paint(live_games, x[live_games], y[live_games], GREEN)
+        uncovered = np.zeros(self.num_envs, dtype=bool)
+        uncovered[tail_games] = tail == self.food[tail_games, 1] * self.cols + self.food[tail_games, 0]
+        food_games = np.flatnonzero(live & (ate | uncovered) & (self.food[:, 0] >= 0))
+        self.paint(food_games, self.food[food_games, 0], self.food[food_games, 1], WHITE)
+
+        finished = np.flatnonzero(done)
+        if len(finished):
+            self.reset_games(finished)
+
+        info = {"score": scores}
+        return self.frames, rewards, done, info
+
+    def close(self):
+        pass
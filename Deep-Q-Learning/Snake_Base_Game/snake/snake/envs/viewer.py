@@ -0,0 +1,103 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import time
+
+import numpy as np
+
+# int64 header at the start of the shared block: a sequence number that is odd while the env
+# writes a frame, the score of that frame and a flag asking the viewer to quit
+SEQ = 0
+SCORE = 1
+STOP = 2
+HEADER = 3
+
+
+def run_viewer(shm_name, shape, block, fps, title):
+    '''
+    Viewer process: draws the newest published cells at up to fps frames per second and
+    skips every frame that was replaced before it got drawn
+    '''
+    import pygame
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+    cells = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=HEADER * 8)
+    pygame.init()
+    window = pygame.display.set_mode((shape[1] * block, shape[0] * block))
+    pygame.display.set_caption(title)
+    clock = pygame.time.Clock()
+    drawn = -1
+    try:
+        while not header[STOP]:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            seq = header[SEQ]
+            if seq != drawn and seq % 2 == 0:
+                latest = cells.copy()
+                score = header[SCORE]
+                # Only draw if the env did not start another frame while we copied
+                if header[SEQ] == seq:
+                    drawn = seq
+                    # Cells are stored (y, x) while pygame surfaces are indexed (x, y)
+                    frame = latest.repeat(block, axis=0).repeat(block, axis=1)
+                    pygame.surfarray.blit_array(window, frame.swapaxes(0, 1))
+                    pygame.display.set_caption('%s - score %d' % (title, score))
+                    pygame.display.update()
+            clock.tick(fps)
+    finally:
+        del header, cells
+        shm.close()
+        pygame.quit()
+
+
+class Viewer():
+    '''
+    Shows a game in a window owned by a separate process, so drawing never blocks the env.
+
+    The env publishes the colors of its cells to a shared memory block, at most fps times
+    per second (due() says when the next one is wanted), and the viewer draws the newest
+    one at its own pace. Frames in between are simply never published.
+    '''
+
+    def __init__(self, shape, fps=30, block=10, title='Snake', context='spawn'):
+        self.shape = shape
+        self.interval = 1.0 / fps
+        self.next_publish = 0.0
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER * 8 + int(np.prod(shape)))
+        self.header = np.ndarray((HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        self.header[:] = 0
+        self.cells = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=HEADER * 8)
+        # A fresh interpreter keeps the viewer's SDL state apart from any pygame use in the env
+        ctx = mp.get_context(context)
+        self.process = ctx.Process(target=run_viewer, args=(self.shm.name, shape, block, fps, title), daemon=True)
+        self.process.start()
+        self.closed = False
+
+    def due(self):
+        '''
+        Returns Boolean indicating if the viewer wants a new frame
+        '''
+        return time.perf_counter() >= self.next_publish
+
+    def publish(self, cells, score):
+        self.next_publish = time.perf_counter() + self.interval
+        self.header[SEQ] += 1
+        self.cells[...] = cells
+        self.header[SCORE] = score
+        self.header[SEQ] += 1
+
+    def is_open(self):
+        return not self.closed and self.process.is_alive()
+
+    def close(self):
+        if self.closed:
+            return
+        self.header[STOP] = 1
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        # Drop our views before releasing the block
+        del self.header, self.cells
+        self.shm.close()
+        self.shm.unlink()
+        self.closed = True
@@ -0,0 +1,3 @@
+from snake.rl.memory import MemmapMemory, PrioritizedMemory, SumTree
+from snake.rl.agents import BatchDQNAgent, PrioritizedDQNAgent
+from snake.rl.actor_learner import ActorLearner, actor_epsilons
@@ -0,0 +1,284 @@
+'''
+Actor/learner training for a PrioritizedDQNAgent. Several actor processes play their own env
+with their own exploration rate and stream what they see into the learner's replay memory.
+The learner process only trains, and sends the actors its weights every few minibatches.
+
+    agent = PrioritizedDQNAgent(model=model, nb_actions=nb_actions, policy=policy, processor=ImageProcessor(),
+                                memory=PrioritizedMemory(limit=1000000, window_length=WINDOW_LENGTH), ...)
+    agent.compile(Adam(learning_rate=.00025), metrics=['mae'])
+    ActorLearner(agent, "snake:snake-v0", nb_actors=4).fit(nb_steps=1500000)
+
+Actors are started with the 'spawn' method, as TensorFlow does not survive a fork once the
+learner has used it. Everything they are given is pickled, so the processor (and model_fn
+if given) must be defined in a module, not in a notebook cell.
+'''
+import multiprocessing as mp
+import os, queue, time
+from collections import deque
+
+import numpy as np
+
+import gym
+
+from snake.rl.memory import PrioritizedMemory
+from snake.rl.agents import PrioritizedDQNAgent
+
+
+def actor_epsilons(nb_actors, epsilon=0.4, alpha=7.):
+    '''
+    Returns the exploration rate of every actor, epsilon ** (1 + alpha * i / (nb_actors - 1)) for
+    actor i as in Ape-X (Horgan et al., 2018): from epsilon down to almost greedy
+    '''
+    if nb_actors == 1:
+        return [epsilon]
+    return [epsilon ** (1 + alpha * i / (nb_actors - 1)) for i in range(nb_actors)]
+
+
+def actor(index, env_id, env_kwargs, model_fn, processor, window_length, epsilon, anneal_steps,
+          segment_length, seed, segments, weights, stop):
+    '''
+    Plays env_id epsilon greedily with a copy of the learner's model, taking up new weights as
+    they arrive in weights. epsilon anneals linearly from 1 over the actor's first anneal_steps
+    steps. Its entries, appended as DQNAgent.fit() appends them to its memory, are put into
+    segments in pieces of segment_length, see PrioritizedMemory.extend()
+    '''
+    try:
+        import tensorflow as tf
+
+        # Every actor is one of many processes, a thread pool each would only fight over the cores
+        tf.config.threading.set_intra_op_parallelism_threads(1)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+        env = gym.make(env_id, **env_kwargs)
+        env.seed(seed)
+        rng = np.random.RandomState(seed)
+        model = model_fn() if callable(model_fn) else tf.keras.models.model_from_json(model_fn)
+        model.set_weights(weights.get())
+        nb_actions = env.action_space.n
+
+        def process(observation, reward=0., done=False, info=None):
+            if processor is None:
+                return observation, reward, done, info
+            return processor.process_step(observation, reward, done, info)
+
+        observation = process(env.reset())[0]
+        # Segments start with the window_length entries before them, zeros for the very first one.
+        # Those stand in for the final observation of an earlier episode, age 0, so the first
+        # observation starts its episode at age 1 like every one after a reset, and no window
+        # of the first episode takes the zeros for its frames
+        entries = [(np.zeros_like(observation), 0, 0., False)] * window_length
+        ages = [0] * window_length
+        age = min(1, window_length - 1)
+        recent = deque([np.zeros_like(observation)] * (window_length - 1) + [observation], maxlen=window_length)
+        steps = 0
+        sent_steps = 0
+        scores = []
+        while not stop.is_set():
+            try:
+                model.set_weights(weights.get_nowait())
+            except queue.Empty:
+                pass
+
+            current = max(epsilon, 1. - (1. - epsilon) * steps / anneal_steps) if anneal_steps else epsilon
+            if rng.random_sample() < current:
+                action = rng.randint(nb_actions)
+            else:
+                state = np.array(recent)[None]
+                if processor is not None:
+                    state = processor.process_state_batch(state)
+                action = int(np.argmax(model.predict_on_batch(state)[0]))
+            next_observation, reward, done, info = process(*env.step(action if processor is None else processor.process_action(action)))
+            steps += 1
+
+            new_entries = [(observation, action, reward, done)]
+            if done:
+                # DQNAgent.fit() appends the final observation too, it is state1 of the last step
+                new_entries.append((next_observation, 0, 0., False))
+                scores.append(info.get("score", 0) if info else 0)
+                next_observation = process(env.reset())[0]
+                recent.extend([np.zeros_like(next_observation)] * (window_length - 1))
+            recent.append(next_observation)
+            observation = next_observation
+            for entry in new_entries:
+                entries.append(entry)
+                ages.append(age)
+                age = 0 if entry[3] else min(age + 1, window_length - 1)
+
+            # window_length entries of context, segment_length new ones and the last one, still without its next observation
+            if len(entries) >= window_length + segment_length + 1:
+                observations, actions, rewards, terminals = zip(*entries)
+                segment = (np.array(observations), np.array(actions, dtype=np.int32),
+                           np.array(rewards, dtype=np.float32), np.array(terminals, dtype=bool), np.array(ages, dtype=np.int16))
+                message = (True, index, (segment, steps - sent_steps, scores))
+                while not stop.is_set():
+                    try:
+                        segments.put(message, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                sent_steps = steps
+                scores = []
+                # The last window_length + 1 entries start the next segment, the last one becomes its first new entry
+                entries = entries[-(window_length + 1):]
+                ages = ages[-(window_length + 1):]
+        env.close()
+    except Exception as e:
+        segments.put((False, index, e))
+
+
+class ActorLearner():
+    '''
+    Trains agent, a compiled PrioritizedDQNAgent with a PrioritizedMemory, on transitions that
+    nb_actors actor processes collect from env_id, made with env_kwargs like SubprocVecEnv's envs.
+    Use alpha=0 for the memory to sample uniformly.
+
+    The actors act with their own copy of agent.model, rebuilt from its JSON or by model_fn,
+    and their own exploration rates, actor_epsilons() unless epsilons are given. agent's policy
+    is not used. The learner trains one minibatch per agent.train_interval steps the actors
+    took, as fit() does. It takes no more segments while it is behind on that, so the bounded
+    segment queue fills up and the actors wait for it. Hard target model updates count the
+    steps the minibatches stand for, as in fit(). The learner sends its weights to the actors
+    every broadcast_interval minibatches. Actors keep playing while the learner trains, so
+    collection scales with the cores as long as the learner keeps up.
+    '''
+
+    def __init__(self, agent, env_id, nb_actors=None, env_kwargs=None, model_fn=None, epsilons=None,
+                 anneal_steps=0, segment_length=100, broadcast_interval=100, seed=0, context='spawn'):
+        if not isinstance(agent, PrioritizedDQNAgent) or not isinstance(agent.memory, PrioritizedMemory):
+            raise ValueError('ActorLearner needs a PrioritizedDQNAgent with a PrioritizedMemory, alpha=0 samples uniformly')
+        if not agent.compiled:
+            raise ValueError('Compile the agent before training it')
+        self.agent = agent
+        self.memory = agent.memory
+        self.env_id = env_id
+        self.env_kwargs = env_kwargs or {}
+        self.nb_actors = nb_actors or max(1, (os.cpu_count() or 2) - 1)
+        self.model_fn = model_fn
+        self.epsilons = list(epsilons) if epsilons is not None else actor_epsilons(self.nb_actors)
+        if len(self.epsilons) != self.nb_actors:
+            raise ValueError('Got %d epsilons for %d actors' % (len(self.epsilons), self.nb_actors))
+        self.anneal_steps = anneal_steps
+        self.segment_length = segment_length
+        self.broadcast_interval = broadcast_interval
+        self.seed = seed
+        self.context = context
+        self.processes = []
+        # Scores of the finished episodes and the actor that played each
+        self.scores = []
+        self.score_actors = []
+
+    def start(self):
+        ctx = mp.get_context(self.context)
+        self.stop = ctx.Event()
+        # A few segments per actor can wait, beyond that the actors wait for the learner
+        self.segments = ctx.Queue(maxsize=4 * self.nb_actors)
+        self.weights = [ctx.Queue(maxsize=1) for _ in range(self.nb_actors)]
+        model_fn = self.model_fn if self.model_fn is not None else self.agent.model.to_json()
+        weights = self.agent.model.get_weights()
+        for index in range(self.nb_actors):
+            self.weights[index].put(weights)
+            args = (index, self.env_id, self.env_kwargs, model_fn, self.agent.processor, self.memory.window_length,
+                    self.epsilons[index], self.anneal_steps, self.segment_length, self.seed + index,
+                    self.segments, self.weights[index], self.stop)
+            process = ctx.Process(target=actor, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def broadcast(self):
+        '''
+        Sends every actor the current weights, replacing any it has not taken up yet
+        '''
+        weights = self.agent.model.get_weights()
+        for weights_queue in self.weights:
+            try:
+                weights_queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                weights_queue.put_nowait(weights)
+            except queue.Full:
+                pass
+
+    def receive(self, timeout=None):
+        '''
+        Adds the next segment from the actors to the memory and returns the steps it covers,
+        0 if none came within timeout seconds (or right away if timeout is 0)
+        '''
+        try:
+            if timeout == 0:
+                success, index, result = self.segments.get_nowait()
+            else:
+                success, index, result = self.segments.get(timeout=timeout)
+        except queue.Empty:
+            return 0
+        if not success:
+            raise RuntimeError('Actor %d failed' % index) from result
+        segment, steps, scores = result
+        self.memory.extend(*segment, context=self.memory.window_length)
+        self.scores.extend(scores)
+        self.score_actors.extend([index] * len(scores))
+        return steps
+
+    def fit(self, nb_steps, log_interval=10000, verbose=1):
+        '''
+        Trains until the actors have taken nb_steps steps and the learner has trained the
+        minibatches they are due, returns a dict of the training's "nb_steps", "nb_train_steps",
+        "episode_score" and "episode_actor"
+        '''
+        agent = self.agent
+        if not self.processes:
+            self.start()
+        agent.training = True
+        steps = 0
+        train_steps = 0
+        next_target_update = agent.target_model_update
+        next_log = log_interval
+        start = time.perf_counter()
+        try:
+            while True:
+                # Steps the minibatches trained so far stand for, as fit() trains one per train_interval steps
+                trained_steps = agent.nb_steps_warmup + train_steps * agent.train_interval
+                if steps <= trained_steps or steps <= agent.nb_steps_warmup:
+                    if steps >= nb_steps:
+                        break
+                    # Only take more from the actors once the learner has caught up, until then
+                    # the segment queue fills up and the actors wait for it
+                    received = self.receive(timeout=1.)
+                    if not received and not any(process.is_alive() for process in self.processes):
+                        raise RuntimeError('Every actor has stopped')
+                    steps += received
+                    continue
+
+                agent.step = trained_steps + agent.train_interval
+                agent.train_step()
+                train_steps += 1
+                if train_steps % self.broadcast_interval == 0:
+                    self.broadcast()
+                if agent.target_model_update >= 1 and agent.step >= next_target_update:
+                    agent.update_target_model_hard()
+                    next_target_update = (agent.step // agent.target_model_update + 1) * agent.target_model_update
+                if verbose and steps >= next_log:
+                    next_log += log_interval
+                    recent = self.scores[-100:]
+                    print('%d steps, %.0f steps/s, %d minibatches, %d episodes, mean score of the last %d %.2f' % (
+                        steps, steps / (time.perf_counter() - start), train_steps, len(self.scores),
+                        len(recent), np.mean(recent) if recent else 0.))
+        finally:
+            self.close()
+        return {"nb_steps": steps, "nb_train_steps": train_steps, "episode_score": self.scores, "episode_actor": self.score_actors}
+
+    def close(self):
+        if not self.processes:
+            return
+        self.stop.set()
+        # Actors may be waiting to put a segment, empty the queue so they notice the stop
+        deadline = time.perf_counter() + 10.
+        while any(process.is_alive() for process in self.processes) and time.perf_counter() < deadline:
+            try:
+                self.segments.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in self.processes:
+            process.join(timeout=1.)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
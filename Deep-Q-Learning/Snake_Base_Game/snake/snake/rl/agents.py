@@ -0,0 +1,115 @@
+import numpy as np
+
+from rl.agents.dqn import DQNAgent
+
+
+class BatchDQNAgent(DQNAgent):
+    '''
+    keras-rl's DQNAgent, trained on whole minibatch arrays. With a memory that has sample_batch(),
+    such as MemmapMemory, the batch goes from the memory to the network without being split into
+    Experiences, and the Q targets are set with one indexed assignment instead of a loop over the
+    batch. Other memories' Experiences are stacked once. Takes the same arguments as DQNAgent and
+    computes the same updates.
+    '''
+
+    def process_state_batch(self, batch):
+        # DQNAgent makes an object array of the batch first, which the processor then has to convert back
+        batch = np.asarray(batch)
+        if self.processor is None:
+            return batch
+        return self.processor.process_state_batch(batch)
+
+    def sample_batch(self):
+        '''
+        Returns a minibatch (state0, actions, rewards, state1, terminal1) of arrays
+        '''
+        if hasattr(self.memory, 'sample_batch'):
+            return self.memory.sample_batch(self.batch_size)
+        experiences = self.memory.sample(self.batch_size)
+        return (np.array([e.state0 for e in experiences]),
+                np.array([e.action for e in experiences]),
+                np.array([e.reward for e in experiences]),
+                np.array([e.state1 for e in experiences]),
+                np.array([e.terminal1 for e in experiences], dtype=bool))
+
+    def backward(self, reward, terminal):
+        # Store most recent experience in memory.
+        if self.step % self.memory_interval == 0:
+            self.memory.append(self.recent_observation, self.recent_action, reward, terminal,
+                               training=self.training)
+
+        metrics = [np.nan for _ in self.metrics_names]
+        if not self.training:
+            return metrics
+
+        if self.step > self.nb_steps_warmup and self.step % self.train_interval == 0:
+            metrics = self.train_step()
+
+        if self.target_model_update >= 1 and self.step % self.target_model_update == 0:
+            self.update_target_model_hard()
+
+        return metrics
+
+    def train_step(self):
+        '''
+        Samples a minibatch, performs one gradient step on it and returns the metrics
+        '''
+        return self.train_batch(*self.sample_batch())
+
+    def compute_targets(self, rewards, state1_batch, terminal1):
+        '''
+        Returns r + gamma * max_a Q(s1, a) of every transition, r alone for terminal ones
+        '''
+        target_q_values = self.target_model.predict_on_batch(state1_batch)
+        if self.enable_double_dqn:
+            # The online network picks the action, the target network values it (van Hasselt et al., 2015)
+            actions = np.argmax(self.model.predict_on_batch(state1_batch), axis=1)
+            q_batch = target_q_values[np.arange(len(actions)), actions]
+        else:
+            q_batch = np.max(target_q_values, axis=1)
+        return rewards + self.gamma * q_batch * ~np.asarray(terminal1, dtype=bool)
+
+    def train_batch(self, state0, actions, rewards, state1, terminal1):
+        '''
+        Performs one gradient step on a minibatch of arrays and returns the metrics
+        '''
+        state0_batch = self.process_state_batch(state0)
+        Rs = self.compute_targets(rewards, self.process_state_batch(state1), terminal1)
+        return self.fit_targets(state0_batch, actions, Rs)
+
+    def fit_targets(self, state0_batch, actions, Rs, weights=None):
+        '''
+        Moves Q(state0, action) of every transition towards its target in Rs, with the loss of
+        each transition scaled by weights if given, and returns the metrics
+        '''
+        # Only the output unit of the taken action gets a target and counts towards the loss
+        rows = np.arange(len(Rs))
+        targets = np.zeros((len(Rs), self.nb_actions), dtype='float32')
+        masks = np.zeros((len(Rs), self.nb_actions), dtype='float32')
+        targets[rows, actions] = Rs
+        masks[rows, actions] = 1.
+
+        ins = [state0_batch] if type(self.model.input) is not list else state0_batch
+        sample_weight = None if weights is None else [weights, np.ones_like(weights)]
+        metrics = self.trainable_model.train_on_batch(ins + [targets, masks], [Rs.astype('float32'), targets], sample_weight=sample_weight)
+        metrics = [metric for idx, metric in enumerate(metrics) if idx not in (1, 2)]  # throw away individual losses
+        metrics += self.policy.metrics
+        if self.processor is not None:
+            metrics += self.processor.metrics
+        return metrics
+
+
+class PrioritizedDQNAgent(BatchDQNAgent):
+    '''
+    BatchDQNAgent for a PrioritizedMemory. It samples minibatches by priority, weights every
+    transition's loss by its importance sampling weight, and gives the transitions their
+    TD errors before the update as new priorities.
+    '''
+
+    def train_step(self):
+        slots, weights, (state0, actions, rewards, state1, terminal1) = self.memory.sample_prioritized(self.batch_size)
+        state0_batch = self.process_state_batch(state0)
+        Rs = self.compute_targets(rewards, self.process_state_batch(state1), terminal1)
+        q_values = self.model.predict_on_batch(state0_batch)
+        self.memory.update_priorities(slots, Rs - q_values[np.arange(len(Rs)), actions])
+        return self.fit_targets(state0_batch, actions, Rs, weights)
@@ -0,0 +1,370 @@
+import mmap, os, tempfile
+
+import numpy as np
+
+from rl.memory import Memory, Experience, sample_batch_indexes
+
+# Linux maps up to this much of a file around every page fault of a mapping (fault_around_bytes),
+# so a random read of a frame costs this much RAM for every page it spans until it is released
+FAULT_AROUND_BYTES = 1 << 16
+
+
+class MemmapMemory(Memory):
+    '''
+    Replay memory for keras-rl's DQNAgent that keeps observations, actions, rewards and terminals
+    in preallocated np.memmap files instead of Python deques. A drop-in for the notebooks'
+    SequentialMemory(limit=1000000, window_length=WINDOW_LENGTH): it samples the same transitions,
+    with the same episode boundaries and zero padding, but builds every window by index arithmetic.
+    sample_batch() returns the minibatch as arrays, which BatchDQNAgent trains on without
+    unpacking it transition by transition.
+
+    The files are written to directory, or to a temporary directory that close() removes.
+    The observation file is created by the first append(), sized for limit observations of its
+    shape and dtype, e.g. about 7 GB of disk for a million 84x84 uint8 frames. RAM use stays flat
+    regardless of limit: whenever about release_bytes of the files have been mapped by writes and
+    reads, the pages are handed back to the OS, which keeps them in its page cache as long as it
+    has room. Rewards are stored as float32.
+    '''
+
+    def __init__(self, limit, directory=None, release_bytes=128 << 20, **kwargs):
+        super().__init__(**kwargs)
+        self.limit = limit
+        self.release_bytes = release_bytes
+        self.tempdir = None
+        if directory is None:
+            self.tempdir = tempfile.TemporaryDirectory(prefix='snake-replay-')
+            directory = self.tempdir.name
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+        self.actions = self.open_array('actions', np.int32)
+        self.rewards = self.open_array('rewards', np.float32)
+        self.terminals = self.open_array('terminals', bool)
+        # Entries since the start of the episode of every entry, capped at window_length - 1,
+        # so the frames of a window from an earlier episode are known without walking back
+        self.ages = self.open_array('ages', np.int16)
+        self.age = 0
+        # Offsets of state0's frames from its last frame, oldest first, without the last
+        self.offsets = np.arange(self.window_length - 1, 0, -1)
+        # (batch, window_length + 1) + observation shape buffer sample_batch() gathers into
+        self.batch_frames = None
+        # Created by the first append(), once the shape and dtype of observations are known
+        self.observations = None
+        # Number of entries ever appended, the newest is at slot (count - 1) % limit
+        self.count = 0
+        # Bytes mapped by reads and writes since the last release()
+        self.touched = 0
+
+    def open_array(self, name, dtype, shape=()):
+        path = os.path.join(self.directory, '%s.dat' % name)
+        return np.memmap(path, dtype=dtype, mode='w+', shape=(self.limit,) + tuple(shape))
+
+    @property
+    def nb_entries(self):
+        return min(self.count, self.limit)
+
+    def slots(self, indexes):
+        '''
+        Maps indexes counted from the oldest entry, as SequentialMemory counts them, to slots of the files
+        '''
+        return (self.count - self.nb_entries + indexes) % self.limit
+
+    def append(self, observation, action, reward, terminal, training=True):
+        super().append(observation, action, reward, terminal, training=training)
+        if not training:
+            return
+        if self.observations is None:
+            observation = np.asarray(observation)
+            self.observations = self.open_array('observations', observation.dtype, observation.shape)
+        slot = self.count % self.limit
+        self.observations[slot] = observation
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.terminals[slot] = terminal
+        self.ages[slot] = self.age
+        self.age = 0 if terminal else min(self.age + 1, self.window_length - 1)
+        self.count += 1
+        # Appends are sequential, one frame maps about its own size
+        self.touch(self.observations[slot].nbytes)
+
+    def sample_indexes(self, batch_size, batch_idxs=None):
+        '''
+        Returns the indexes of the transitions to sample, shifted by one like SequentialMemory's:
+        entry idx - 1 holds state0's last frame, action, reward and terminal1, entry idx state1's last frame
+        '''
+        assert self.nb_entries >= self.window_length + 2, 'not enough entries in the memory'
+        if batch_idxs is None:
+            batch_idxs = sample_batch_indexes(self.window_length, self.nb_entries - 1, size=batch_size)
+        idxs = np.array(batch_idxs) + 1
+        assert np.min(idxs) >= self.window_length + 1
+        assert np.max(idxs) < self.nb_entries
+        assert len(idxs) == batch_size
+
+        # Transitions out of a terminal state span two episodes, like SequentialMemory they are
+        # replaced by other random transitions, in the same order so the random draws match
+        for i in np.flatnonzero(self.terminals[self.slots(idxs - 2)]):
+            idx = idxs[i]
+            while self.terminals[self.slots(idx - 2)]:
+                idx = sample_batch_indexes(self.window_length + 1, self.nb_entries, size=1)[0]
+            idxs[i] = idx
+        return idxs
+
+    def gather_windows(self, idxs, out=None):
+        '''
+        Returns the (batch, window_length + 1) + observation shape frames idx - window_length .. idx
+        of every idx, with the frames before the start of state0's episode zeroed. state0 is
+        [:, :-1] and state1 [:, 1:]. The frames are gathered into out if it is given
+        '''
+        window = self.window_length
+        frames = np.take(self.observations, self.slots(idxs[:, None] + np.arange(-window, 1)), axis=0, out=out, mode='clip')
+        if window > 1 and not self.ignore_episode_boundaries:
+            # Frame idx - 1 - offset of state0 belongs to another episode if entry idx - 2 is less
+            # than offset entries into its episode, SequentialMemory's walk back from idx - 1
+            other_episode = self.offsets > self.ages[self.slots(idxs - 2)][:, None]
+            frames[:, :window - 1][other_episode] = 0
+        # A frame that is not page aligned spans one page more than its size
+        pages = frames[0, 0].nbytes // mmap.PAGESIZE + 2
+        self.touch(frames.shape[0] * frames.shape[1] * pages * FAULT_AROUND_BYTES)
+        return frames
+
+    def sample(self, batch_size, batch_idxs=None):
+        '''
+        Returns batch_size Experiences like SequentialMemory.sample(), with state0 and state1 as
+        (window_length,) + observation shape arrays
+        '''
+        idxs = self.sample_indexes(batch_size, batch_idxs)
+        frames = self.gather_windows(idxs)
+        last = self.slots(idxs - 1)
+        actions = self.actions[last]
+        rewards = self.rewards[last]
+        terminals = self.terminals[last]
+        return [Experience(state0=frames[i, :-1], action=int(actions[i]), reward=float(rewards[i]),
+                           state1=frames[i, 1:], terminal1=bool(terminals[i])) for i in range(batch_size)]
+
+    def sample_batch(self, batch_size, batch_idxs=None):
+        '''
+        Returns the transitions sample() would as arrays (state0, actions, rewards, state1, terminal1),
+        state0 and state1 (batch_size, window_length) + observation shape. They are views of a
+        buffer that the next call overwrites, so copy them to keep them
+        '''
+        return self.transitions(self.sample_indexes(batch_size, batch_idxs))
+
+    def transitions(self, idxs):
+        '''
+        Returns the arrays of sample_batch() for the transitions idxs, indexes as sample_indexes() returns them
+        '''
+        shape = (len(idxs), self.window_length + 1) + self.observations.shape[1:]
+        if self.batch_frames is None or self.batch_frames.shape != shape:
+            self.batch_frames = np.empty(shape, dtype=self.observations.dtype)
+        frames = self.gather_windows(idxs, out=self.batch_frames)
+        last = self.slots(idxs - 1)
+        return frames[:, :-1], self.actions[last], self.rewards[last], frames[:, 1:], self.terminals[last]
+
+    def touch(self, nbytes):
+        self.touched += nbytes
+        if self.touched >= self.release_bytes:
+            self.release()
+
+    def release(self):
+        '''
+        Unmaps every page of the files from the process. Nothing is lost, the OS writes them back
+        and keeps them cached, but they no longer count towards the process's RAM
+        '''
+        self.touched = 0
+        for array in (self.observations, self.actions, self.rewards, self.terminals, self.ages):
+            # np.memmap keeps its mmap in _mmap, madvise needs Python 3.8 and a POSIX system
+            buffer = getattr(array, '_mmap', None)
+            if buffer is not None and hasattr(buffer, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+                buffer.madvise(mmap.MADV_DONTNEED)
+
+    def close(self):
+        '''
+        Closes the files, and removes them if they are in a temporary directory
+        '''
+        for name in ('observations', 'actions', 'rewards', 'terminals', 'ages'):
+            array = getattr(self, name)
+            if array is not None:
+                array.flush()
+            setattr(self, name, None)
+        if self.tempdir is not None:
+            self.tempdir.cleanup()
+            self.tempdir = None
+
+    def get_config(self):
+        config = super().get_config()
+        config['limit'] = self.limit
+        return config
+
+
+class SumTree():
+    '''
+    Binary tree of sums over capacity priorities, kept in one array: node 1 is the root, the
+    children of node i are 2i and 2i + 1, and the priorities are the leaves from node leaves on.
+    Setting a priority and finding the leaf at a point of the cumulative sum both take O(log n),
+    and update() and find() handle a whole batch per level of the tree.
+    '''
+
+    def __init__(self, capacity):
+        self.leaves = 1 << max(0, capacity - 1).bit_length()
+        self.tree = np.zeros(2 * self.leaves)
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def get(self, indexes):
+        return self.tree[self.leaves + np.asarray(indexes)]
+
+    def set(self, index, priority):
+        '''
+        Sets one priority, faster than update() for a single index
+        '''
+        tree = self.tree
+        node = self.leaves + index
+        tree[node] = priority
+        node //= 2
+        while node:
+            # Sums are recomputed from the children instead of adding the change, so rounding errors do not build up
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node //= 2
+
+    def update(self, indexes, priorities):
+        '''
+        Sets the priorities of indexes, the last one counts for an index given twice
+        '''
+        tree = self.tree
+        nodes = self.leaves + np.asarray(indexes)
+        tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0]:
+            tree[nodes] = tree[2 * nodes] + tree[2 * nodes + 1]
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        '''
+        Returns the index of the leaf at every point values of the cumulative sum of the priorities,
+        values in [0, total). Leaves with priority 0 are never returned
+        '''
+        tree = self.tree
+        values = np.array(values, dtype=float)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaves:
+            left = tree[2 * nodes]
+            # Rounding can leave a value just above the sum of a node, never step into an empty subtree for it
+            go_right = (values >= left) & (tree[2 * nodes + 1] > 0)
+            values -= np.where(go_right, left, 0)
+            nodes = 2 * nodes + go_right
+        return nodes - self.leaves
+
+
+class PrioritizedMemory(MemmapMemory):
+    '''
+    MemmapMemory that samples transitions in proportion to their priority (Schaul et al., 2016,
+    proportional variant), for PrioritizedDQNAgent. A transition's priority is
+    (|TD error| + epsilon) ** alpha. New transitions get the highest priority seen so far, so each
+    is replayed at least once soon. The priorities are kept in a SumTree over the slots of the
+    memory, about 16 MB for limit=1000000. Transitions that SequentialMemory would never sample,
+    out of a terminal state or without a full window in the memory, have priority 0.
+
+    Sampling is biased towards high priorities, sample_prioritized() returns importance sampling
+    weights that undo it to the degree beta, which goes from beta to 1 over beta_steps appends
+    if beta_steps is given. sample() and sample_batch() still sample uniformly.
+    '''
+
+    def __init__(self, limit, alpha=0.6, beta=0.4, beta_steps=None, epsilon=1e-6, **kwargs):
+        super().__init__(limit, **kwargs)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_steps = beta_steps
+        self.epsilon = epsilon
+        self.tree = SumTree(limit)
+        self.max_priority = 1.
+
+    @property
+    def current_beta(self):
+        if not self.beta_steps:
+            return self.beta
+        return self.beta + (1. - self.beta) * min(1., self.count / self.beta_steps)
+
+    def append(self, observation, action, reward, terminal, training=True):
+        super().append(observation, action, reward, terminal, training=training)
+        if not training:
+            return
+        # Entries are counted from the first ever appended here, entry e is in slot e % limit.
+        # Entry e is the transition of sample index e + 1, state1 ends with entry e + 1
+        newest = self.count - 1
+        oldest = self.count - self.nb_entries
+        # The newest entry has no next observation yet
+        self.tree.set(newest % self.limit, 0.)
+        # The one before now has, and is a transition unless it starts in a terminal state or lacks a full window
+        complete = newest - 1
+        if complete - oldest >= self.window_length and not self.terminals[(complete - 1) % self.limit]:
+            self.tree.set(complete % self.limit, self.max_priority)
+        # Once the memory is full, every append cuts the first window_length entries' windows short
+        if self.count > self.limit:
+            self.tree.set((oldest + self.window_length - 1) % self.limit, 0.)
+
+    def extend(self, observations, actions, rewards, terminals, ages, context):
+        '''
+        Appends a segment of one stream of entries, such as an actor's, between the segments of
+        other streams. The first context entries (at least window_length) repeat the end of the
+        stream's previous segment, only for the windows of the entries after them, and the last
+        entry waits for its next observation in the next segment. Neither becomes a transition.
+        ages are the entries' ages in their episode, as append() counts them.
+        Transitions of such a memory must be sampled with sample_prioritized().
+        '''
+        count = len(actions)
+        if count > self.limit:
+            raise ValueError('A segment of %d entries does not fit a memory of %d' % (count, self.limit))
+        if self.observations is None:
+            self.observations = self.open_array('observations', observations.dtype, observations.shape[1:])
+        oldest = self.count - self.nb_entries
+        slots = (self.count + np.arange(count)) % self.limit
+        self.observations[slots] = observations
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.terminals[slots] = terminals
+        self.ages[slots] = ages
+        self.count += count
+
+        # As in append(), no transitions out of a terminal state
+        valid = np.zeros(count, dtype=bool)
+        valid[context:-1] = ~np.asarray(terminals[context - 1:-2], dtype=bool)
+        self.tree.update(slots, np.where(valid, self.max_priority, 0.))
+        # Nor from the entries whose windows now reach past the oldest one
+        new_oldest = self.count - self.nb_entries
+        if new_oldest > oldest:
+            cut = np.arange(max(oldest + self.window_length, new_oldest), new_oldest + self.window_length)
+            self.tree.update(cut % self.limit, 0.)
+        self.touch(observations.nbytes)
+
+    def sample_prioritized(self, batch_size):
+        '''
+        Returns (slots, weights, batch): batch_size transitions sampled by priority, one from each
+        of batch_size equal parts of the total priority, as a tuple of sample_batch() arrays,
+        their slots for update_priorities() and their importance sampling weights, the largest 1
+        '''
+        total = self.tree.total
+        assert total > 0, 'not enough entries in the memory'
+        slots = self.tree.find((np.arange(batch_size) + np.random.random_sample(batch_size)) * (total / batch_size))
+        probabilities = self.tree.get(slots) / total
+        weights = (self.nb_entries * probabilities) ** -self.current_beta
+        weights /= weights.max()
+        # Sample index of the transition in slot, counted from the oldest entry
+        idxs = (slots - (self.count - self.nb_entries)) % self.limit + 1
+        return slots, weights.astype(np.float32), self.transitions(idxs)
+
+    def update_priorities(self, slots, td_errors):
+        '''
+        Sets the priorities of the transitions in slots from their TD errors
+        '''
+        priorities = (np.abs(td_errors) + self.epsilon) ** self.alpha
+        # A slot that was overwritten or cut short since it was sampled is no transition any more
+        priorities[self.tree.get(slots) == 0] = 0.
+        self.tree.update(slots, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+
+    def get_config(self):
+        config = super().get_config()
+        config.update(alpha=self.alpha, beta=self.beta, beta_steps=self.beta_steps, epsilon=self.epsilon)
+        return config
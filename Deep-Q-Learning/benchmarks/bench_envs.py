@@ -0,0 +1,313 @@
+'''
+Benchmarks SnakeEnv.step() and reset() of every snake variant.
+
+For each variant it reports steps/sec for three scenarios, reset latency, the memory a step
+allocates, the peak RSS of a fresh process that ran only that variant, and how long it takes
+to import the variant, to construct an env and to spin up a worker process that has one:
+
+- script: a fixed, seeded list of random actions
+- random: a random policy drawing its actions while the env runs, seeded apart from the
+  script so it plays other episodes, and the time it takes to draw them is counted
+- long: replays actions recorded from a tail following policy with no step limit, so the
+  snake grows long, the recording is made before timing starts
+
+Every variant runs headless in its own process. Results can be saved as a JSON baseline and
+compared against one, e.g.
+
+    python benchmarks/bench_envs.py --save benchmarks/baseline.json
+    python benchmarks/bench_envs.py --baseline benchmarks/baseline.json
+
+exits with status 1 if a metric got worse than the baseline by more than --tolerance.
+'''
+import argparse, json, os, platform, random, resource, sys, time, tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+# No window and no pygame banner, set before any env module imports pygame
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+
+VARIANTS = {
+    'snake': 'snake.envs.snake_env',
+    'poison': 'poison.envs.snake_env',
+    'poison_triple': 'poison_triple.envs.snake_env',
+    'walls': 'walls.envs.snake_env',
+}
+SCENARIOS = ('script', 'random', 'long')
+MOVES = ((0, -10), (0, 10), (-10, 0), (10, 0))
+
+# Metric name and whether a larger value is better
+METRICS = {
+    'steps_per_sec': True,
+    'reset_us': False,
+    'alloc_bytes_per_step': False,
+    'peak_rss_kb': False,
+    'import_ms': False,
+    'construct_ms': False,
+    'spin_up_ms': False,
+}
+
+
+def make_env(variant, obs_mode, seed):
+    module = __import__(VARIANTS[variant], fromlist=['SnakeEnv'])
+    env = module.SnakeEnv(obs_mode)
+    env.seed(seed)
+    env.reset()
+    return env
+
+
+def reachable(env, start, goal, blocked):
+    '''
+    Returns Boolean indicating if goal can be reached from start without crossing a blocked cell
+    '''
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for dx, dy in MOVES:
+            pos = (x + dx, y + dy)
+            if pos == goal:
+                return True
+            if pos in seen or pos in blocked or not env.in_window(pos):
+                continue
+            seen.add(pos)
+            queue.append(pos)
+    return False
+
+
+def tail_following_policy(env):
+    '''
+    Heads for the nearest food, but only takes moves after which the snake can still reach its tail
+    '''
+    head = tuple(env.snake_pos)
+    body = [tuple(pos) for pos in env.snake_body]
+    walls = {tuple(pos) for pos in env.wall_pos}
+    poison = {tuple(pos) for pos in env.poison_items}
+    food = [tuple(pos) for pos in env.food_items] or [body[-1]]
+    options = []
+    for action, (dx, dy) in enumerate(MOVES):
+        pos = (head[0] + dx, head[1] + dy)
+        eats = pos in food
+        # The tail moves out of the way unless the snake grows
+        rest = body if eats else body[:-1]
+        if not env.in_window(pos) or pos in walls or pos in rest or pos in poison:
+            continue
+        distance = min(abs(pos[0] - x) + abs(pos[1] - y) for x, y in food)
+        options.append((distance, action, pos, rest))
+    options.sort()
+    for distance, action, pos, rest in options:
+        blocked = set(rest[:-1]) | walls | poison
+        if reachable(env, pos, rest[-1], blocked):
+            return action
+    return options[0][1] if options else 0
+
+
+def action_script(variant, obs_mode, seed, steps, scenario):
+    '''
+    Returns the actions the script or long scenario replays
+    '''
+    if scenario == 'script':
+        rng = random.Random(seed)
+        return [rng.randrange(4) for _ in range(steps)]
+    env = make_env(variant, 'grid', seed)
+    env.STEP_LIMIT = steps
+    actions = []
+    for _ in range(steps):
+        action = tail_following_policy(env)
+        actions.append(action)
+        _, _, done, _ = env.step(action)
+        if done:
+            env.reset()
+    return actions
+
+
+def time_steps(variant, obs_mode, seed, steps, actions=None, step_limit=None):
+    '''
+    Returns steps/sec and the mean snake length, the time spent in reset() is not counted.
+    Without actions a random policy plays, and drawing its actions is timed with the steps
+    '''
+    env = make_env(variant, obs_mode, seed)
+    if step_limit is not None:
+        env.STEP_LIMIT = step_limit
+    # Its own seed, with seed the policy would draw the actions of the script scenario
+    rng = random.Random(seed + 1)
+    elapsed = 0.0
+    length = 0
+    for i in range(steps):
+        start = time.perf_counter()
+        action = actions[i] if actions is not None else rng.randrange(4)
+        _, _, done, _ = env.step(action)
+        elapsed += time.perf_counter() - start
+        length += len(env.snake_body)
+        if done:
+            env.reset()
+    return steps / elapsed, length / steps
+
+
+def time_resets(variant, obs_mode, seed, resets):
+    env = make_env(variant, obs_mode, seed)
+    start = time.perf_counter()
+    for _ in range(resets):
+        env.reset()
+    return (time.perf_counter() - start) / resets * 1e6
+
+
+def measure_allocations(variant, obs_mode, seed, actions):
+    '''
+    Returns the mean number of bytes a step allocates on top of what was live before it
+    '''
+    env = make_env(variant, obs_mode, seed)
+    total = 0
+    tracemalloc.start()
+    for action in actions:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        _, _, done, _ = env.step(action)
+        total += tracemalloc.get_traced_memory()[1] - before
+        if done:
+            env.reset()
+    tracemalloc.stop()
+    return total / len(actions)
+
+
+def bench_variant(variant, obs_mode, seed, steps, resets, repeat):
+    '''
+    Runs every measurement for one variant, meant to run in a fresh process.
+    Timings are the best of repeat runs, like timeit does.
+    '''
+    result = {}
+    start = time.perf_counter()
+    module = __import__(VARIANTS[variant], fromlist=['SnakeEnv'])
+    result['import_ms'] = (time.perf_counter() - start) * 1e3
+    constructs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        module.SnakeEnv(obs_mode)
+        constructs.append((time.perf_counter() - start) * 1e3)
+    result['construct_ms'] = min(constructs)
+
+    script = action_script(variant, obs_mode, seed, steps, 'script')
+    long_script = action_script(variant, obs_mode, seed, steps, 'long')
+
+    runs = [time_steps(variant, obs_mode, seed, steps, actions=script) for _ in range(repeat)]
+    result['script'] = {'steps_per_sec': max(runs)[0], 'mean_length': runs[0][1]}
+    runs = [time_steps(variant, obs_mode, seed, steps) for _ in range(repeat)]
+    result['random'] = {'steps_per_sec': max(runs)[0], 'mean_length': runs[0][1]}
+    runs = [time_steps(variant, obs_mode, seed, steps, actions=long_script, step_limit=steps) for _ in range(repeat)]
+    result['long'] = {'steps_per_sec': max(runs)[0], 'mean_length': runs[0][1]}
+    result['reset_us'] = min(time_resets(variant, obs_mode, seed, resets) for _ in range(repeat))
+    result['alloc_bytes_per_step'] = measure_allocations(variant, obs_mode, seed, script[:min(steps, 2000)])
+    # ru_maxrss is in kilobytes on Linux
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def start_env(variant, obs_mode):
+    make_env(variant, obs_mode, 0)
+
+
+def spin_up(variant, obs_mode):
+    '''
+    Returns the milliseconds from starting a spawned worker until it has an env ready
+    '''
+    start = time.perf_counter()
+    with ProcessPoolExecutor(1, mp_context=mp.get_context('spawn')) as pool:
+        pool.submit(start_env, variant, obs_mode).result()
+        elapsed = time.perf_counter() - start
+    return elapsed * 1e3
+
+
+def flatten(results):
+    '''
+    Yields (variant, scenario or None, metric, value) for every compared metric
+    '''
+    for variant, result in results.items():
+        for scenario in SCENARIOS:
+            yield variant, scenario, 'steps_per_sec', result[scenario]['steps_per_sec']
+        for metric in METRICS:
+            # Baselines saved before a metric was added simply lack it
+            if metric != 'steps_per_sec' and metric in result:
+                yield variant, None, metric, result[metric]
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Prints the change of every metric against baseline, returns the regressions
+    '''
+    old = {(variant, scenario, metric): value for variant, scenario, metric, value in flatten(baseline['results'])}
+    regressions = []
+    for variant, scenario, metric, value in flatten(results):
+        key = (variant, scenario, metric)
+        if key not in old or not old[key]:
+            continue
+        change = (value - old[key]) / old[key]
+        worse = -change if METRICS[metric] else change
+        name = '%s %s' % (variant, scenario + ' ' + metric if scenario else metric)
+        flag = ''
+        if worse > tolerance:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print('%-40s %14.1f -> %14.1f  %+7.1f%%%s' % (name, old[key], value, change * 100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument('--obs-mode', choices=['rgb', 'grid', 'gray', 'rays'], default='rgb')
+    parser.add_argument('--steps', type=int, default=20000, help='steps per scenario')
+    parser.add_argument('--resets', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per measurement, the best one counts')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative slowdown, default 0.1')
+    args = parser.parse_args()
+
+    results = {}
+    for variant in args.variants:
+        # A fresh process per variant keeps peak RSS and imports separate
+        with ProcessPoolExecutor(1, mp_context=mp.get_context('spawn')) as pool:
+            results[variant] = pool.submit(bench_variant, variant, args.obs_mode, args.seed, args.steps, args.resets, args.repeat).result()
+        result = results[variant]
+        result['spin_up_ms'] = min(spin_up(variant, args.obs_mode) for _ in range(args.repeat))
+        print('%-14s script %9.0f  random %9.0f  long %9.0f steps/s (mean length %.0f)  reset %7.1f us  %7.0f B/step  %7d KB RSS' % (
+            variant, result['script']['steps_per_sec'], result['random']['steps_per_sec'],
+            result['long']['steps_per_sec'], result['long']['mean_length'], result['reset_us'],
+            result['alloc_bytes_per_step'], result['peak_rss_kb']))
+        print('%-14s import %7.1f ms  construct %6.2f ms  worker spin-up %7.1f ms' % (
+            variant, result['import_ms'], result['construct_ms'], result['spin_up_ms']))
+
+    report = {
+        'meta': {
+            'obs_mode': args.obs_mode,
+            'steps': args.steps,
+            'resets': args.resets,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta']['obs_mode'] != args.obs_mode:
+            print('Warning: the baseline was measured with obs_mode=%r' % baseline['meta']['obs_mode'])
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('%d regression(s) beyond %.0f%%' % (len(regressions), args.tolerance * 100))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()